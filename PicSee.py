@@ -72,6 +72,7 @@ from PyQt5.QtCore import (
     QThreadPool,
     QRunnable,
     pyqtSignal,
+    pyqtSlot,
     QObject,
     QRectF,
     QPoint,
@@ -84,7 +85,13 @@ from PyQt5.QtCore import (
     QFileInfo,
     QStorageInfo,
     QStandardPaths,
+    QFile,
+    QIODevice,
+    QUrlQuery,
+    QBuffer,
+    QFileSystemWatcher,
 )
+from PyQt5 import sip
 from PyQt5.QtGui import (
     QPixmap,
     QImage,
@@ -111,9 +118,25 @@ from PyQt5.QtGui import (
     QFont,
     QFontDatabase,
 )
-from PIL import Image, ImageOps, UnidentifiedImageError, ExifTags
+from PIL import Image, ImageOps, UnidentifiedImageError, ExifTags, features
 import io
 import json
+import hashlib
+import re
+import struct
+from array import array
+from itertools import compress, repeat
+import threading
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
 import time
 import unicodedata
 import send2trash
@@ -220,6 +243,14 @@ try:
         QWebEngineView,
         QWebEnginePage,
         QWebEngineContextMenuData,
+        QWebEngineScript,
+    )
+    from PyQt5.QtWebChannel import QWebChannel
+
+    from PyQt5.QtWebEngineCore import (
+        QWebEngineUrlScheme,
+        QWebEngineUrlSchemeHandler,
+        QWebEngineUrlRequestJob,
     )
 
     WEBENGINE_AVAILABLE = True
@@ -228,6 +259,11 @@ except ImportError:
     QWebEngineView = QWidget  # Mock for fallback
     QWebEnginePage = object
     QWebEngineContextMenuData = object
+    QWebEngineScript = None
+    QWebChannel = None
+    QWebEngineUrlScheme = None
+    QWebEngineUrlSchemeHandler = QObject
+    QWebEngineUrlRequestJob = object
 
 
 def resource_path(relative_path):
@@ -1453,6 +1489,7 @@ class FloatingSearchBox(QWidget):
     """居中弹出的搜索框"""
 
     sig_search = pyqtSignal(str)
+    sig_library_search = pyqtSignal(str)  # 在所有扫描过的文件夹中搜索
 
     def __init__(self, parent=None, is_dark=True):
         super().__init__(parent)
@@ -1465,6 +1502,13 @@ class FloatingSearchBox(QWidget):
         self.setFixedSize(960, 128)
         self._setup_ui()
 
+        # 边输入边搜索：每次输入重新计时，取消尚未执行的查询
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._emit_search)
+        self.input.textChanged.connect(self._on_text_changed)
+
     def _setup_ui(self):
         layout = QHBoxLayout(self)
         layout.setContentsMargins(32, 16, 32, 16)
@@ -1482,6 +1526,14 @@ class FloatingSearchBox(QWidget):
         self.input.returnPressed.connect(self._on_search)
         container_layout.addWidget(self.input)
 
+        # 图库搜索开关：选中后回车在所有扫描过的文件夹中搜索，不再边输入边筛选
+        self.library_btn = QPushButton()
+        self.library_btn.setObjectName("libraryToggle")
+        self.library_btn.setCheckable(True)
+        self.library_btn.setCursor(Qt.PointingHandCursor)
+        self.library_btn.setFocusPolicy(Qt.NoFocus)
+        container_layout.addWidget(self.library_btn)
+
         # 搜索图标
         self.icon_label = QLabel()
         # 图标也相应缩小
@@ -1526,8 +1578,38 @@ class FloatingSearchBox(QWidget):
             }}
         """)
 
-    def _on_search(self):
+        self.library_btn.setStyleSheet(f"""
+            #libraryToggle {{
+                background: transparent;
+                border: 1px solid {border_color};
+                border-radius: 14px;
+                color: {placeholder_color};
+                font-size: 18px;
+                padding: 4px 14px;
+            }}
+            #libraryToggle:checked {{
+                border-color: #3d8bfd;
+                color: {text_color};
+            }}
+        """)
+
+    def set_library_text(self, label, tooltip):
+        self.library_btn.setText(label)
+        self.library_btn.setToolTip(tooltip)
+
+    def _on_text_changed(self, _text):
+        if not self.library_btn.isChecked():
+            self._search_timer.start()
+
+    def _emit_search(self):
         self.sig_search.emit(self.input.text())
+
+    def _on_search(self):
+        self._search_timer.stop()
+        if self.library_btn.isChecked():
+            self.sig_library_search.emit(self.input.text())
+        else:
+            self._emit_search()
         self.hide()
 
     def showEvent(self, event):
@@ -1550,6 +1632,106 @@ class FloatingSearchBox(QWidget):
             super().keyPressEvent(event)
 
 
+class WebBridge(QObject):
+    """Python 与页面之间的 QWebChannel 通信对象（页面中为 channel.objects.picsee）
+
+    数据通过带类型的信号推送给页面，页面通过槽函数回调 Python。
+    图片列表只推送数量和宽高比，完整记录由页面按页拉取（request_images）。
+    stats_requested 请页面回报缩略图加载统计（report_stats），用于诊断。
+    页面调用 ready() 之前发出的消息先缓存，连接建立后按顺序补发，
+    避免旧的 document.title 方式在连续消息时丢失或合并。
+    """
+
+    # Python -> 页面
+    images_cleared = pyqtSignal()
+    images_extended = pyqtSignal("QVariantList")
+    images_ordered = pyqtSignal("QVariantList", bool)  # 宽高比, 是否保持滚动位置
+    images_page = pyqtSignal(int, int, "QVariantList")
+    images_inserted = pyqtSignal("QVariantList")
+    images_removed = pyqtSignal("QVariantList")
+    image_updated = pyqtSignal("QVariantMap")
+    image_rotated = pyqtSignal(str, int, int, str, int)  # 路径, 宽, 高, 版本号, 视图位置（-1 未知）
+    exif_info = pyqtSignal("QVariantMap")
+    stats_requested = pyqtSignal()
+
+    # 页面 -> Python（转发给窗口）
+    sig_images_requested = pyqtSignal(int, int, int)
+    sig_image_clicked = pyqtSignal(str, int)
+    sig_exif_requested = pyqtSignal(str)
+    sig_stats_reported = pyqtSignal("QVariantMap")
+    sig_close_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ready = False
+        self._pending = []
+
+    def reset(self):
+        """页面重新加载时调用：等待新页面再次 ready()"""
+        self._ready = False
+        self._pending.clear()
+
+    def post(self, name, *args):
+        """发送信号；页面尚未连接时先排队"""
+        if self._ready:
+            getattr(self, name).emit(*args)
+        else:
+            self._pending.append((name, args))
+
+    @pyqtSlot()
+    def ready(self):
+        self._ready = True
+        pending, self._pending = self._pending, []
+        for name, args in pending:
+            getattr(self, name).emit(*args)
+
+    @pyqtSlot(int, int, int)
+    def request_images(self, generation, start, count):
+        self.sig_images_requested.emit(generation, start, count)
+
+    @pyqtSlot(str, int)
+    def image_clicked(self, path, index):
+        self.sig_image_clicked.emit(path, index)
+
+    @pyqtSlot(str)
+    def request_exif(self, path):
+        self.sig_exif_requested.emit(path)
+
+    @pyqtSlot("QVariantMap")
+    def report_stats(self, stats):
+        self.sig_stats_reported.emit(stats)
+
+    @pyqtSlot()
+    def request_close(self):
+        self.sig_close_requested.emit()
+
+
+def install_web_bridge(view):
+    """为 WebEngineView 建立 QWebChannel，并在文档创建时注入 qwebchannel.js"""
+    if not WEBENGINE_AVAILABLE:
+        return None
+    page = view.page()
+    bridge = WebBridge(view)
+    channel = QWebChannel(page)
+    channel.registerObject("picsee", bridge)
+    page.setWebChannel(channel)
+    view.loadStarted.connect(bridge.reset)
+
+    f = QFile(":/qtwebchannel/qwebchannel.js")
+    if f.open(QIODevice.ReadOnly):
+        script = QWebEngineScript()
+        script.setName("qwebchannel")
+        script.setSourceCode(bytes(f.readAll()).decode("utf-8"))
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        page.scripts().insert(script)
+        f.close()
+    else:
+        print("qwebchannel.js not found in Qt resources")
+    return bridge
+
+
 class CustomWebEngineView(QWebEngineView):
     """自定义 WebEngineView 以支持右键菜单"""
 
@@ -1569,6 +1751,17 @@ class CustomWebEngineView(QWebEngineView):
         super().__init__(parent)
         self.lang = lang
 
+        # 在页面 profile 上安装缩略图协议处理器（picsee-thumb://）
+        self.thumb_handler = None
+        if WEBENGINE_AVAILABLE:
+            profile = self.page().profile()
+            handler = profile.urlSchemeHandler(THUMBNAIL_SCHEME)
+            if not isinstance(handler, ThumbnailSchemeHandler):
+                handler = ThumbnailSchemeHandler(profile)
+                profile.installUrlSchemeHandler(THUMBNAIL_SCHEME, handler)
+            self.thumb_handler = handler
+        self.bridge = install_web_bridge(self)
+
     def contextMenuEvent(self, event):
         if not WEBENGINE_AVAILABLE:
             return super().contextMenuEvent(event)
@@ -1595,6 +1788,12 @@ class CustomWebEngineView(QWebEngineView):
             # 检查是否点击了图片
             if data.mediaType() == QWebEngineContextMenuData.MediaTypeImage:
                 url = data.mediaUrl()
+                # 瀑布流显示的是 picsee-thumb:// 缩略图，反查对应的原图路径
+                source_path = (
+                    self.thumb_handler.path_for_url(url) if self.thumb_handler else None
+                )
+                if source_path:
+                    url = QUrl.fromLocalFile(source_path)
                 if url.isLocalFile():
                     file_path = url.toLocalFile()
 
@@ -1716,10 +1915,20 @@ class CustomWebEngineView(QWebEngineView):
                 main_window, "current_format_filter", t["all_formats"]
             )
 
+            # 各分类的图片数（由分面位图统计）
+            facet_counts = {}
+            if hasattr(main_window, "_facet_counts"):
+                facet_counts = main_window._facet_counts()
+
+            def counted(label):
+                if label not in facet_counts:
+                    return label
+                return t["filter_count"].format(label, facet_counts[label])
+
             def add_format_action(menu_obj, label):
                 # 保持与排序菜单一致：点后面跟2个空格
                 prefix = "·  " if current_format == label else "   "
-                action = QAction(prefix + label, self)
+                action = QAction(prefix + counted(label), self)
                 action.triggered.connect(lambda: self.sig_format_changed.emit(label))
                 menu_obj.addAction(action)
 
@@ -1745,7 +1954,7 @@ class CustomWebEngineView(QWebEngineView):
             def add_size_action(menu_obj, label):
                 # 保持与排序菜单一致：点后面跟2个空格
                 prefix = "·  " if current_size == label else "   "
-                action = QAction(prefix + label, self)
+                action = QAction(prefix + counted(label), self)
                 action.triggered.connect(lambda: self.sig_size_changed.emit(label))
                 menu_obj.addAction(action)
 
@@ -2165,10 +2374,51 @@ MIN_WINDOW_WIDTH = 800
 MIN_WINDOW_HEIGHT = 600
 # 性能配置
 MAX_THREADS = 2  # 降低线程数，减少崩溃
+SCAN_WALK_THREADS = 8  # 递归扫描时并行列目录的线程数（高延迟存储上收益明显）
+# 目录快照：扫描时间比目录修改时间晚这么多秒以上才信任快照（避免同一时间戳内的修改被漏掉）
+DIR_SNAPSHOT_RACY_SECONDS = 2.0
+# 文件夹监视：超过这些数量视为溢出，改为整体重新扫描
+WATCH_MAX_DIRS = 256  # 递归模式下最多监视的目录数
+WATCH_MAX_PENDING_DIRS = 32  # 一次防抖周期内变化的目录数
+WATCH_DEBOUNCE_MS = 300  # 合并短时间内的多次变化通知
+SEARCH_DEBOUNCE_MS = 150  # 边输入边搜索：停止输入这么久后才执行查询
+WEB_PAGE_MAX = 1000  # 瀑布流页面单次拉取的图片记录上限
+# 元数据库连接参数（每个线程复用一个长连接）
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # 内存映射读取的上限（字节）
+SQLITE_CACHE_SIZE_KB = 16 * 1024  # 每个连接的页缓存（KB）
+SQLITE_IDLE_CLOSE_SECONDS = 120  # 空闲这么久的连接视为线程已退出，新建连接时顺带关闭
+# 缓存写入由后台线程合并成大事务：攒够这么多行或等待这么久就提交一次
+METADATA_WRITE_BATCH_ROWS = 2000
+METADATA_WRITE_FLUSH_SECONDS = 0.5
+# 缓存回收：空闲时清理已不存在的文件，超出预算时按最后访问时间淘汰最久未用的记录
+METADATA_CACHE_MAX_FILES = 500_000  # 图片元数据行数上限
+METADATA_CACHE_MAX_EXIF = 100_000  # EXIF 缓存行数上限
+METADATA_CACHE_MAX_SNAPSHOTS = 20_000  # 目录快照数上限
+METADATA_CACHE_MAX_MB = 256  # 数据库大小上限（MB）
+METADATA_GC_IDLE_MS = 120_000  # 空闲（无扫描）这么久后开始回收
+METADATA_GC_INTERVAL_HOURS = 24  # 两次回收的最短间隔
 # 滚动加载阈值（距离底部多少像素触发加载）
 SCROLL_THRESHOLD = 100
 # 图片质量配置（核心优化：最高质量小图）
 IMAGE_QUALITY_SCALE = 2.0  # 缩放系数提升至2.0，预加载更高清小图
+# 缩略图缓存配置（瀑布流加载列宽尺寸的缩略图，而不是原图）
+THUMBNAIL_FORMAT = "WEBP"  # 缩略图格式：WEBP / JPEG（不支持 WebP 时自动回退 JPEG）
+THUMBNAIL_QUALITY = 85  # 缩略图编码质量
+THUMBNAIL_WIDTH_STEP = 64  # 缩略图宽度按步长向上取整，提高缓存命中率
+THUMBNAIL_MAX_WIDTH = 1600  # 缩略图最大宽度
+THUMBNAIL_CACHE_MAX_MB = 1024  # 缩略图磁盘缓存上限（MB），超出后淘汰最旧文件
+THUMBNAIL_SCHEME = b"picsee-thumb"  # 缩略图协议：picsee-thumb://<id>?w=<宽度>
+# 降采样解码：JPEG 先用 Image.draft 按 1/2、1/4、1/8 缩小解码，再做高质量缩放
+# 设置环境变量 PICSEE_FAST_DECODE=0 可切回完整解码，用于对比画质和速度
+FAST_DOWNSCALE_DECODE = os.environ.get("PICSEE_FAST_DECODE", "1") != "0"
+REDUCING_GAP = 3.0  # resize 先按整数倍 reduce 再精细缩放（3.0 时与直接缩放几乎无差别）
+USE_EMBEDDED_THUMBNAIL = True  # 内嵌 EXIF 缩略图足够大时直接使用，跳过原图解码
+# 多进程解码：绕开 GIL 和 MAX_THREADS 限制，损坏文件导致的崩溃只影响子进程
+# 环境变量 PICSEE_PROCESS_DECODE=0 关闭，PICSEE_DECODE_PROCESSES 指定进程数
+USE_PROCESS_DECODER = os.environ.get("PICSEE_PROCESS_DECODE", "1") != "0"
+DECODE_PROCESSES = int(os.environ.get("PICSEE_DECODE_PROCESSES") or 0) or min(
+    os.cpu_count() or 2, 16
+)
 # 预览方式配置
 USE_SYSTEM_VIEWER = False  # 使用优化后的内置查看器
 # 内置预览窗口配置
@@ -2319,6 +2569,315 @@ def safe_path(path):
 g_mutex = QMutex()
 
 
+def open_image_scaled(path, fit_w, fit_h, fast=None):
+    """打开图片并按 EXIF 方向校正，解码分辨率只需覆盖等比缩放到 fit_w x fit_h 内的尺寸
+
+    fast 为 True 时 JPEG 使用 Image.draft 在 DCT 域直接按 2 的幂次降采样解码，
+    为 False 时完整解码（原有路径），默认取 FAST_DOWNSCALE_DECODE。
+
+    Returns:
+        (image, (原图宽, 原图高))，尺寸均为方向校正后的值
+    """
+    if fast is None:
+        fast = FAST_DOWNSCALE_DECODE
+
+    with Image.open(path) as img:
+        orientation = 1
+        try:
+            orientation = img.getexif().get(274, 1)
+        except Exception:
+            pass
+        swapped = orientation in (5, 6, 7, 8)
+        src_w, src_h = (img.height, img.width) if swapped else img.size
+
+        if fast and img.format == "JPEG" and src_w > 0 and src_h > 0:
+            scale = min(fit_w / src_w, fit_h / src_h, 1.0)
+            need_w = max(1, int(src_w * scale + 0.999))
+            need_h = max(1, int(src_h * scale + 0.999))
+            # draft 作用于未旋转的原始数据，需要按方向交换宽高
+            img.draft(img.mode, (need_h, need_w) if swapped else (need_w, need_h))
+
+        return ImageOps.exif_transpose(img), (src_w, src_h)
+
+
+# EXIF 方向 -> 校正用的转换（与 ImageOps.exif_transpose 一致）
+EXIF_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def _jpeg_exif_tiff_offset(fp):
+    """遍历 JPEG 段标记，返回 Exif APP1 中 TIFF 头在文件内的偏移"""
+    fp.seek(0)
+    if fp.read(2) != b"\xff\xd8":
+        return None
+    pos = 2
+    while True:
+        header = fp.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker in (0xDA, 0xD9):  # 已到图像数据，没有 Exif 段
+            return None
+        if marker == 0xE1 and fp.read(6) == b"Exif\x00\x00":
+            return pos + 10
+        pos += 2 + int.from_bytes(header[2:4], "big")
+        fp.seek(pos)
+
+
+def _thumbnail_matches_aspect(thumb_w, thumb_h, w, h):
+    """部分相机为了固定 160x120 会填充黑边，比例与原图不一致时不使用"""
+    if not thumb_w or not thumb_h or not w or not h:
+        return False
+    return abs(thumb_w / thumb_h - w / h) <= 0.02 * (w / h)
+
+
+def read_embedded_thumbnail(img):
+    """读取 EXIF IFD1 中内嵌 JPEG 缩略图的位置和尺寸
+
+    只读取文件头和缩略图本身的 SOF，不解码任何像素。
+
+    Args:
+        img: 已打开（未 load）的 JPEG / TIFF 图片
+
+    Returns:
+        (文件内偏移, 字节数, 宽, 高)，尺寸为未按方向校正的值；
+        没有内嵌缩略图或比例与原图不一致（带黑边）时返回 None
+    """
+    try:
+        if img.format not in ("JPEG", "TIFF"):
+            return None
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset = ifd1.get(0x0201)  # JPEGInterchangeFormat
+        length = ifd1.get(0x0202)  # JPEGInterchangeFormatLength
+        if not offset or not length:
+            return None
+
+        base = _jpeg_exif_tiff_offset(img.fp) if img.format == "JPEG" else 0
+        if base is None:
+            return None
+        img.fp.seek(base + offset)
+        data = img.fp.read(length)
+        if len(data) != length or not data.startswith(b"\xff\xd8"):
+            return None
+
+        with Image.open(io.BytesIO(data)) as thumb:
+            thumb_w, thumb_h = thumb.size
+        if not _thumbnail_matches_aspect(thumb_w, thumb_h, img.width, img.height):
+            return None
+        return (base + offset, length, thumb_w, thumb_h)
+    except Exception:
+        return None
+
+
+def load_embedded_thumbnail(path, embedded):
+    """按扫描时记录的位置读出内嵌缩略图并按 EXIF 方向校正"""
+    offset, length, _, _, orientation = embedded
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    method = EXIF_ORIENTATION_TRANSPOSE.get(orientation)
+    return img.transpose(method) if method is not None else img
+
+
+def embedded_thumbnail_width(embedded):
+    """内嵌缩略图按方向校正后的宽度"""
+    _, _, thumb_w, thumb_h, orientation = embedded
+    return thumb_h if orientation in (5, 6, 7, 8) else thumb_w
+
+
+# ===================== 图片头解析 =====================
+# SOF0~SOF15，排除 DHT(C4)、JPG(C8)、DAC(CC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _sniff_jpeg(fp):
+    """遍历 JPEG 段标记直到 SOF
+
+    Returns:
+        (宽, 高, Exif 中的 TIFF 数据, TIFF 数据在文件中的偏移)，失败返回 None
+    """
+    fp.seek(2)
+    pos = 2
+    exif = None
+    exif_base = None
+    while True:
+        header = fp.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker == 0xFF:  # 填充字节
+            pos += 1
+            fp.seek(pos)
+            continue
+        if marker in (0xDA, 0xD9):
+            return None
+        seg_len = int.from_bytes(header[2:4], "big")
+        if marker in _JPEG_SOF_MARKERS:
+            data = fp.read(5)
+            if len(data) < 5:
+                return None
+            height = int.from_bytes(data[1:3], "big")
+            width = int.from_bytes(data[3:5], "big")
+            return width, height, exif, exif_base
+        if marker == 0xE1 and exif is None:
+            data = fp.read(seg_len - 2)
+            if data.startswith(b"Exif\x00\x00"):
+                exif = data[6:]
+                exif_base = pos + 10
+        pos += 2 + seg_len
+        fp.seek(pos)
+
+
+def _read_tiff_ifd(read, offset, endian):
+    """读取一个 IFD，返回 ({标签: 值}, 下一个 IFD 偏移)，只保留单值 SHORT/LONG"""
+    count = struct.unpack(endian + "H", read(offset, 2))[0]
+    if count > 1000:
+        raise ValueError("IFD 条目数异常")
+    data = read(offset + 2, count * 12 + 4)
+    tags = {}
+    for i in range(count):
+        tag, typ, cnt = struct.unpack_from(endian + "HHI", data, i * 12)
+        if cnt != 1:
+            continue
+        if typ == 3:
+            tags[tag] = struct.unpack_from(endian + "H", data, i * 12 + 8)[0]
+        elif typ == 4:
+            tags[tag] = struct.unpack_from(endian + "I", data, i * 12 + 8)[0]
+    next_ifd = struct.unpack_from(endian + "I", data, count * 12)[0]
+    return tags, next_ifd
+
+
+def _sniff_tiff(read):
+    """解析 TIFF IFD0/IFD1，read(偏移, 长度) 读取 TIFF 数据
+
+    Returns:
+        (宽, 高, 方向, (缩略图偏移, 字节数) 或 None)，宽高可能为 None（Exif 中的 TIFF 没有）
+    """
+    head = read(0, 8)
+    if head[:4] == b"II*\x00":
+        endian = "<"
+    elif head[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        return None
+    ifd0 = struct.unpack(endian + "I", head[4:8])[0]
+    tags, next_ifd = _read_tiff_ifd(read, ifd0, endian)
+    thumb = None
+    if next_ifd:
+        ifd1, _ = _read_tiff_ifd(read, next_ifd, endian)
+        if ifd1.get(0x0201) and ifd1.get(0x0202):
+            thumb = (ifd1[0x0201], ifd1[0x0202])
+    return tags.get(256), tags.get(257), tags.get(274) or 1, thumb
+
+
+def _sniff_thumbnail(data, base, offset, w, h):
+    """校验内嵌缩略图数据并读取其尺寸，返回 read_embedded_thumbnail 格式的结果"""
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    size = _sniff_jpeg(io.BytesIO(data))
+    if not size or not _thumbnail_matches_aspect(size[0], size[1], w, h):
+        return None
+    return (base + offset, len(data), size[0], size[1])
+
+
+def sniff_image_header(path):
+    """只读取文件头解析尺寸、EXIF 方向和内嵌缩略图，不创建 Pillow 图片对象
+
+    支持 JPEG / PNG / GIF / WebP / BMP / TIFF。
+
+    Returns:
+        (宽, 高, 方向, 内嵌缩略图)，宽高为未按方向校正的值，内嵌缩略图同
+        read_embedded_thumbnail；无法识别时返回 None，由调用方改用 Pillow
+    """
+    try:
+        with open(path, "rb") as fp:
+            head = fp.read(32)
+            w = h = None
+            orientation = 1
+            embedded = None
+
+            if head[:3] == b"\xff\xd8\xff":
+                result = _sniff_jpeg(fp)
+                if not result:
+                    return None
+                w, h, exif, exif_base = result
+                if exif:
+                    tiff = _sniff_tiff(lambda off, n: exif[off : off + n])
+                    if tiff:
+                        orientation = tiff[2]
+                        if tiff[3]:
+                            off, length = tiff[3]
+                            data = exif[off : off + length]
+                            if len(data) == length:
+                                embedded = _sniff_thumbnail(data, exif_base, off, w, h)
+            elif head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                w, h = struct.unpack(">II", head[16:24])
+            elif head[:6] in (b"GIF87a", b"GIF89a"):
+                w, h = struct.unpack("<HH", head[6:10])
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                chunk = head[12:16]
+                if chunk == b"VP8X":
+                    w = int.from_bytes(head[24:27], "little") + 1
+                    h = int.from_bytes(head[27:30], "little") + 1
+                elif chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+                    w = struct.unpack("<H", head[26:28])[0] & 0x3FFF
+                    h = struct.unpack("<H", head[28:30])[0] & 0x3FFF
+                elif chunk == b"VP8L" and head[20] == 0x2F:
+                    bits = int.from_bytes(head[21:25], "little")
+                    w = (bits & 0x3FFF) + 1
+                    h = ((bits >> 14) & 0x3FFF) + 1
+            elif head[:2] == b"BM":
+                if struct.unpack("<I", head[14:18])[0] == 12:  # OS/2 BITMAPCOREHEADER
+                    w, h = struct.unpack("<HH", head[18:22])
+                else:
+                    w, h = struct.unpack("<ii", head[18:26])
+                    h = abs(h)  # 负数表示自上而下存储
+            elif head[:4] in (b"II*\x00", b"MM\x00*"):
+
+                def read(off, n):
+                    fp.seek(off)
+                    return fp.read(n)
+
+                tiff = _sniff_tiff(read)
+                if tiff:
+                    w, h, orientation, thumb = tiff
+                    if thumb and w and h:
+                        data = read(thumb[0], thumb[1])
+                        if len(data) == thumb[1]:
+                            embedded = _sniff_thumbnail(data, 0, thumb[0], w, h)
+
+            if not w or not h:
+                return None
+            return w, h, orientation, embedded
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+
+
+def read_image_header_pillow(path):
+    """用 Pillow 读取文件头，返回值同 sniff_image_header（解析失败时抛出异常）"""
+    with Image.open(path) as img:
+        w, h = img.size
+        # Handle EXIF Orientation
+        orientation = 1
+        try:
+            exif = img._getexif()
+            if exif:
+                orientation = exif.get(274) or 1  # 274 is Orientation
+        except:
+            pass
+        # 顺便记录内嵌 EXIF 缩略图的位置，首屏可直接使用
+        return w, h, orientation, read_embedded_thumbnail(img)
+
+
 # 信号发射器
 class WorkerSignals(QObject):
     # path, pixmap, width, height
@@ -2348,54 +2907,50 @@ class ImageLoadTask(QRunnable):
                 self.is_finished = True
                 return
 
-            # 使用 Pillow 加载并处理图片
-            with Image.open(self.path) as img:
-                # 处理 EXIF 旋转
-                img = ImageOps.exif_transpose(img)
-                orig_w, orig_h = img.size
-
-                # 计算目标高度，保持比例
-                scale = self.col_width / orig_w
-                target_h = int(orig_h * scale)
-
-                # 高质量缩放
-                resample_method = getattr(Image.Resampling, "LANCZOS", Image.LANCZOS)
-                img = img.resize((self.col_width, target_h), resample_method)
-
-                # 转换为 RGB/RGBA
-                if img.mode not in ["RGB", "RGBA"]:
-                    img = img.convert("RGB")
-
-                # 转换为 QImage
-                img_data = img.tobytes()
-                q_format = (
-                    QImage.Format_RGBA8888
-                    if img.mode == "RGBA"
-                    else QImage.Format_RGB888
+            # 在解码进程中加载并缩放到列宽（已处理 EXIF 旋转）
+            img = g_decode_service.decode(self.path, self.col_width, 1 << 30)
+            # 计算目标高度，保持比例
+            scale = self.col_width / img.width
+            target_h = int(img.height * scale)
+
+            # 小图放大到列宽
+            if img.width != self.col_width:
+                img = process_enhanced_image(img, self.col_width, target_h)
+
+            # 转换为 RGB/RGBA
+            if img.mode not in ["RGB", "RGBA"]:
+                img = img.convert("RGB")
+
+            # 转换为 QImage
+            img_data = img.tobytes()
+            q_format = (
+                QImage.Format_RGBA8888
+                if img.mode == "RGBA"
+                else QImage.Format_RGB888
+            )
+            q_img = QImage(
+                img_data,
+                self.col_width,
+                target_h,
+                self.col_width * len(img.mode),
+                q_format,
+            ).copy()
+
+            # 在主线程中创建 QPixmap 是最安全的，但为了兼容现有代码逻辑，
+            # 我们先在这里生成 QPixmap。注意：在某些环境下这可能导致不稳定。
+            # 如果出现崩溃，应改为在信号中传递 QImage。
+            pixmap = QPixmap.fromImage(q_img)
+
+            if not self.is_finished:
+                # 还原原始路径用于匹配
+                original_path = (
+                    self.path.replace("\\\\?\\", "")
+                    if sys.platform == "win32"
+                    else self.path
+                )
+                self.signals.finished.emit(
+                    original_path, pixmap, self.col_width, target_h
                 )
-                q_img = QImage(
-                    img_data,
-                    self.col_width,
-                    target_h,
-                    self.col_width * len(img.mode),
-                    q_format,
-                ).copy()
-
-                # 在主线程中创建 QPixmap 是最安全的，但为了兼容现有代码逻辑，
-                # 我们先在这里生成 QPixmap。注意：在某些环境下这可能导致不稳定。
-                # 如果出现崩溃，应改为在信号中传递 QImage。
-                pixmap = QPixmap.fromImage(q_img)
-
-                if not self.is_finished:
-                    # 还原原始路径用于匹配
-                    original_path = (
-                        self.path.replace("\\\\?\\", "")
-                        if sys.platform == "win32"
-                        else self.path
-                    )
-                    self.signals.finished.emit(
-                        original_path, pixmap, self.col_width, target_h
-                    )
 
         except Exception as e:
             print(f"ImageLoadTask error: {e}")
@@ -2405,35 +2960,137 @@ class ImageLoadTask(QRunnable):
 
 # ===================== 元数据缓存 (SQLite) =====================
 class MetadataCache:
-    def __init__(self):
-        # 获取系统数据目录
-        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir, exist_ok=True)
-
-        self.db_path = os.path.join(data_dir, "metadata_cache.db")
+    def __init__(self, db_path=None):
+        if db_path is None:
+            # 获取系统数据目录
+            data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+            if not os.path.exists(data_dir):
+                os.makedirs(data_dir, exist_ok=True)
+            db_path = os.path.join(data_dir, "metadata_cache.db")
+
+        self.db_path = db_path
         self._lock = QMutex()
+        # 线程 id -> (连接, 最后使用时间)
+        # 不用 threading.local：QThreadPool 线程每次执行任务后 Python 线程状态会被重置
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._dir_ids = {}  # 目录路径 -> dir_id，目录记录只增不改，可以常驻内存
+        # 图库全文索引使用的分词器（trigram / unicode61），SQLite 不支持 FTS5 时为 None
+        self._library_tokenizer = None
+        self._library_backfill = False
+        # 旧库需要一次完整 VACUUM（启用增量 VACUUM、回收迁移留下的空间），留到空闲回收时执行
+        self._full_vacuum_pending = False
         self._init_db()
 
+        # 所有写操作进入队列，由唯一的写线程合并提交，扫描线程和界面线程不再等待写锁
+        # 队列元素：(写函数, 参数, 行数)；写函数为 None 时参数是 flush 的 Event
+        self._write_queue = queue.Queue()
+        # 已排队但尚未提交的快照失效：目录键 -> 次数，读取快照时视为不存在
+        self._pending_invalidations = {}
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="PicSeeCacheWriter", daemon=True
+        )
+        self._writer.start()
+        if self._library_backfill:
+            # 新建的全文索引由写线程补上已缓存的图片，不阻塞启动
+            self._enqueue_write(self._write_library_backfill, (), 0)
+
+    def _open_connection(self):
+        # 每个连接只被一个线程使用，check_same_thread=False 仅为了能在退出时统一关闭
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _connection(self):
+        """当前线程的长连接，首次使用时创建
+
+        连接常驻后页缓存、mmap 和语句缓存（已编译的 SQL）才能跨调用复用。
+        """
+        ident = threading.get_ident()
+        now = time.monotonic()
+        with self._connections_lock:
+            entry = self._connections.get(ident)
+            if entry is None:
+                for key, (conn, last_used) in list(self._connections.items()):
+                    if now - last_used > SQLITE_IDLE_CLOSE_SECONDS:
+                        del self._connections[key]
+                        conn.close()
+                conn = self._open_connection()
+            else:
+                conn = entry[0]
+            self._connections[ident] = (conn, now)
+        return conn
+
+    def close(self):
+        """提交排队中的写操作并关闭所有线程的连接（程序退出时调用）"""
+        if not self.flush(timeout=10):
+            print("Metadata cache writer did not finish in time")
+        with self._connections_lock:
+            connections = [conn for conn, _ in self._connections.values()]
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Error closing metadata connection: {e}")
+
+    # 元数据列（内嵌 EXIF 缩略图：偏移、字节数、宽高、方向）
+    _META_COLUMNS = (
+        "width",
+        "height",
+        "size",
+        "mtime",
+        "thumb_offset",
+        "thumb_length",
+        "thumb_w",
+        "thumb_h",
+        "orientation",
+    )
+    # 同一目录请求的文件数超过该值时整目录范围扫描，否则逐个按主键查找
+    _RANGE_SCAN_MIN = 16
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        migrated = False
+        # 增量 VACUUM 需要 auto_vacuum=INCREMENTAL；已有数据的旧库要完整 VACUUM 一次才会生效，
+        # 在那之前每次启动读到的仍是旧值，所以推迟到空闲回收也不会漏掉
+        has_tables = conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            migrated = bool(has_tables)
+        with conn:
             conn.execute("PRAGMA journal_mode=WAL")  # 使用 WAL 模式提升并发读写性能
-            conn.execute("PRAGMA synchronous=NORMAL")
+            # 图片元数据按 (目录, 文件名) 聚簇存储：同一文件夹的记录在 B 树中相邻，
+            # 扫描一个文件夹只需一次范围查询
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS image_metadata (
-                    path TEXT PRIMARY KEY,
+                CREATE TABLE IF NOT EXISTS directories (
+                    dir_id INTEGER PRIMARY KEY,
+                    dir_path TEXT NOT NULL UNIQUE,
+                    last_access REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_metadata (
+                    dir_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
                     width INTEGER,
                     height INTEGER,
                     size INTEGER,
-                    mtime REAL
-                )
+                    mtime REAL,
+                    thumb_offset INTEGER,
+                    thumb_length INTEGER,
+                    thumb_w INTEGER,
+                    thumb_h INTEGER,
+                    orientation INTEGER,
+                    PRIMARY KEY (dir_id, name)
+                ) WITHOUT ROWID
             """)
-            # 为路径建立索引以加快查询
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_path ON image_metadata(path)")
-            # 添加复合索引，加速基于路径和修改时间的缓存验证查询（性能优化）
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_path_mtime ON image_metadata(path, mtime)"
-            )
+            migrated = self._migrate_image_metadata(conn) or migrated
             # 创建 EXIF 信息缓存表（性能优化：加速图片预览信息加载）
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS exif_cache (
@@ -2449,88 +3106,436 @@ class MetadataCache:
                     exposure TEXT,
                     focal_length TEXT,
                     lens TEXT,
-                    mtime REAL
+                    mtime REAL,
+                    last_access REAL
                 )
             """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_exif_path ON exif_cache(path)")
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_exif_mtime ON exif_cache(path, mtime)"
+            # 主键本身就是 path 索引，旧版本额外建的索引只会拖慢写入、增大文件
+            conn.execute("DROP INDEX IF EXISTS idx_exif_path")
+            conn.execute("DROP INDEX IF EXISTS idx_exif_mtime")
+            # 目录快照表：目录修改时间未变时直接返回图片列表，无需逐个 stat 子文件
+            # files 为 JSON：[[文件名, 宽, 高, 大小, 修改时间, 内嵌缩略图], ...]
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS directory_snapshot (
+                    dir_path TEXT PRIMARY KEY,
+                    dir_mtime REAL,
+                    scanned_at REAL,
+                    files TEXT,
+                    subdirs TEXT,
+                    last_access REAL
+                )
+            """)
+            # 旧版本数据库补充最后访问时间字段（缓存回收按它淘汰）
+            for table in ("directories", "exif_cache", "directory_snapshot"):
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "last_access" not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN last_access REAL")
+            self._init_library_index(conn)
+        # 大库完整 VACUUM 可能要几十秒，不在启动时（界面线程）执行
+        self._full_vacuum_pending = migrated
+
+    def _init_library_index(self, conn):
+        """图库全文索引：文件名、文件夹名和缓存的 EXIF（相机、镜头、拍摄时间）
+
+        library_docs 给每个 (dir_id, 文件名) 分配 doc_id，作为 FTS5 表的 rowid。
+        优先用 trigram 分词（任意子串、中文文件名都能匹配），旧版 SQLite 退回 unicode61。
+        """
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'library_fts'"
+        ).fetchone()
+        if row:
+            self._library_tokenizer = "trigram" if "trigram" in row[0] else "unicode61"
+            return
+        for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE library_fts USING fts5("
+                    f"name, folder, camera, lens, capture_time, tokenize='{tokenizer}')"
+                )
+            except sqlite3.OperationalError:
+                continue
+            self._library_tokenizer = tokenizer.split()[0]
+            break
+        else:
+            print("SQLite FTS5 is not available, library search falls back to LIKE")
+            return
+        conn.execute("DROP TABLE IF EXISTS library_docs")
+        conn.execute("""
+            CREATE TABLE library_docs (
+                doc_id INTEGER PRIMARY KEY,
+                dir_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                UNIQUE (dir_id, name)
             )
+        """)
+        self._library_backfill = True
+
+    def _migrate_image_metadata(self, conn):
+        """把旧版本按完整路径存储的 image_metadata 表迁移到 file_metadata"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'image_metadata'"
+        ).fetchone()
+        if not exists:
+            return False
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(image_metadata)")}
+        select = ", ".join(
+            c if c in columns else "NULL" for c in ("path",) + self._META_COLUMNS
+        )
+        rows = conn.execute(f"SELECT {select} FROM image_metadata").fetchall()
+        dir_ids = self._lookup_dir_ids(
+            conn, {os.path.dirname(row[0]) for row in rows}, create=True
+        )
+        conn.executemany(
+            f"INSERT OR REPLACE INTO file_metadata (dir_id, name, {', '.join(self._META_COLUMNS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(self._META_COLUMNS))})",
+            (
+                (dir_ids[os.path.dirname(row[0])], os.path.basename(row[0])) + tuple(row[1:])
+                for row in rows
+            ),
+        )
+        # 删除旧表时 idx_path / idx_path_mtime 一并删除
+        conn.execute("DROP TABLE image_metadata")
+        print(f"Migrated {len(rows)} metadata rows to file_metadata")
+        return True
+
+    def _lookup_dir_ids(self, conn, dir_paths, create=False):
+        """目录路径 -> dir_id，create=True 时为不存在的目录新建记录"""
+        ids = {}
+        for dir_path in dir_paths:
+            dir_id = self._dir_ids.get(dir_path)
+            if dir_id is None:
+                if create:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO directories (dir_path, last_access) VALUES (?, ?)",
+                        (dir_path, time.time()),
+                    )
+                row = conn.execute(
+                    "SELECT dir_id FROM directories WHERE dir_path = ?", (dir_path,)
+                ).fetchone()
+                if row is None:
+                    continue
+                dir_id = self._dir_ids[dir_path] = row[0]
+            ids[dir_path] = dir_id
+        return ids
+
+    @staticmethod
+    def _group_by_dir(paths):
+        """按所在目录分组：目录 -> {文件名: 原始路径}"""
+        groups = {}
+        split = os.path.split
+        for path in paths:
+            dir_path, name = split(path)
+            names = groups.get(dir_path)
+            if names is None:
+                names = groups[dir_path] = {}
+            names[name] = path
+        return groups
+
+    def get_directory_metadata(self, dir_path):
+        """一次范围查询取出目录下所有已缓存的元数据
+
+        dir_path 须与 os.path.dirname(图片路径) 完全一致。
+
+        Returns:
+            dict: 文件名 -> (width, height, size, mtime, embedded)
+        """
+        results = {}
+        try:
+            with self._connection() as conn:
+                dir_id = self._lookup_dir_ids(conn, (dir_path,)).get(dir_path)
+                if dir_id is None:
+                    return results
+                self._touch("directories", "dir_id", (dir_id,))
+                for row in conn.execute(
+                    f"SELECT name, {', '.join(self._META_COLUMNS)} FROM file_metadata WHERE dir_id = ?",
+                    (dir_id,),
+                ):
+                    embedded = row[5:10] if row[5] is not None else None
+                    results[row[0]] = (row[1], row[2], row[3], row[4], embedded)
+        except Exception as e:
+            print(f"Error fetching directory metadata: {e}")
+        return results
 
     def get_metadata_batch(self, paths):
-        """批量获取元数据，极大提升扫描性能"""
+        """批量获取元数据，极大提升扫描性能
+
+        Returns:
+            dict: path -> (width, height, size, mtime, embedded)，
+            embedded 为内嵌缩略图 (偏移, 字节数, 宽, 高, 方向)，没有时为 None
+        """
         if not paths:
             return {}
 
         results = {}
+        columns = ", ".join(self._META_COLUMNS)
         try:
-            # 使用上下文管理器确保连接关闭
-            with sqlite3.connect(self.db_path) as conn:
-                # SQLite 默认一次最多处理 999 个变量，我们分片处理
-                for i in range(0, len(paths), 900):
-                    chunk = paths[i : i + 900]
-                    placeholders = ",".join(["?"] * len(chunk))
-                    cursor = conn.execute(
-                        f"SELECT path, width, height, size, mtime FROM image_metadata WHERE path IN ({placeholders})",
-                        chunk,
-                    )
-                    for row in cursor.fetchall():
-                        results[row[0]] = (row[1], row[2], row[3], row[4])
+            groups = self._group_by_dir(paths)
+            # 上下文管理器只负责提交/回滚事务，连接本身常驻
+            with self._connection() as conn:
+                dir_ids = self._lookup_dir_ids(conn, groups)
+                if dir_ids:
+                    self._touch("directories", "dir_id", dir_ids.values())
+                for dir_path, names in groups.items():
+                    dir_id = dir_ids.get(dir_path)
+                    if dir_id is None:
+                        continue
+                    if len(names) > self._RANGE_SCAN_MIN:
+                        rows = conn.execute(
+                            f"SELECT name, {columns} FROM file_metadata WHERE dir_id = ?",
+                            (dir_id,),
+                        ).fetchall()
+                    else:
+                        rows = []
+                        for name in names:
+                            rows.extend(
+                                conn.execute(
+                                    f"SELECT name, {columns} FROM file_metadata "
+                                    "WHERE dir_id = ? AND name = ?",
+                                    (dir_id, name),
+                                )
+                            )
+                    for row in rows:
+                        path = names.get(row[0])
+                        if path is None:
+                            continue
+                        embedded = row[5:10] if row[5] is not None else None
+                        results[path] = (row[1], row[2], row[3], row[4], embedded)
         except Exception as e:
             print(f"Error fetching metadata batch: {e}")
         return results
 
+    # ---------- 写线程 ----------
+
+    def _enqueue_write(self, write, args, rows=1):
+        self._write_queue.put((write, args, rows))
+
+    def flush(self, timeout=None):
+        """等待此前排队的写操作全部提交，超时返回 False"""
+        done = threading.Event()
+        self._write_queue.put((None, done, 0))
+        return done.wait(timeout)
+
+    def _writer_loop(self):
+        while True:
+            ops = [self._write_queue.get()]
+            rows = ops[0][2]
+            deadline = time.monotonic() + METADATA_WRITE_FLUSH_SECONDS
+            # 继续收集，直到行数够多、等待超时或遇到 flush 请求
+            while ops[-1][0] is not None and rows < METADATA_WRITE_BATCH_ROWS:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    op = self._write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                ops.append(op)
+                rows += op[2]
+
+            writes = [op for op in ops if op[0] is not None and op[0] != self._write_vacuum]
+            if writes:
+                self._apply_writes(writes)
+            # VACUUM / checkpoint 不能在事务中执行，在这一批提交之后单独执行
+            if any(op[0] == self._write_vacuum for op in ops):
+                self._write_vacuum(self._connection())
+            for write, done, _ in ops:
+                if write is None:
+                    done.set()
+
+    def _apply_writes(self, ops):
+        """在一个事务中执行一批写操作；失败时逐个重试，避免一条坏数据拖累整批"""
+        try:
+            with self._connection() as conn:
+                for write, args, _ in ops:
+                    write(conn, *args)
+        except Exception as e:
+            # 事务回滚后新建的 dir_id 可能无效，丢弃内存中的映射
+            self._dir_ids.clear()
+            if len(ops) > 1:
+                for op in ops:
+                    self._apply_writes([op])
+            else:
+                print(f"Error writing metadata cache ({ops[0][0].__name__}): {e}")
+            return
+        for write, args, _ in ops:
+            if write == self._write_invalidation:
+                key = args[0]
+                with self._connections_lock:
+                    left = self._pending_invalidations.get(key, 0) - 1
+                    if left > 0:
+                        self._pending_invalidations[key] = left
+                    else:
+                        self._pending_invalidations.pop(key, None)
+
+    # ---------- 图片元数据 ----------
+
     def save_metadata_batch(self, items):
-        """批量保存元数据，提升性能"""
+        """批量保存元数据（排队，由写线程提交）"""
         if not items:
             return
+        # 入队时即生成行数据，之后 item 被修改（如旋转）也不影响写入内容
+        rows = []
+        for item in items:
+            dir_path, name = os.path.split(item["path"])
+            rows.append(
+                (dir_path, name, item["w"], item["h"], item["size"], item["mtime"])
+                + tuple(item.get("embedded") or (None,) * 5)
+            )
+        self._enqueue_write(self._write_metadata, (rows,), len(rows))
+
+    def _write_metadata(self, conn, rows):
+        dir_ids = self._lookup_dir_ids(conn, {row[0] for row in rows}, create=True)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO file_metadata (dir_id, name, {', '.join(self._META_COLUMNS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(self._META_COLUMNS))})",
+            [(dir_ids[row[0]],) + row[1:] for row in rows],
+        )
+        self._write_touch(conn, "directories", "dir_id", dir_ids.values(), time.time())
+        self._write_library_docs(conn, [(dir_ids[row[0]], row[0], row[1]) for row in rows])
+
+    def _touch(self, table, key_column, keys):
+        """记录访问时间（排队写入，不占用行数）"""
+        self._enqueue_write(self._write_touch, (table, key_column, list(keys), time.time()), 0)
+
+    def _write_touch(self, conn, table, key_column, keys, now):
+        conn.executemany(
+            f"UPDATE {table} SET last_access = ? WHERE {key_column} = ?",
+            [(now, key) for key in keys],
+        )
+
+    @staticmethod
+    def _dir_key(dir_path):
+        return os.path.normcase(ThumbnailCache._clean_path(dir_path))
+
+    def get_directory_snapshot(self, dir_path, dir_mtime):
+        """目录未变化时返回 (图片元数据列表, 子目录名列表)，否则返回 None
+
+        只信任扫描时间比目录修改时间晚 DIR_SNAPSHOT_RACY_SECONDS 以上的快照。
+        注意：原地改写文件内容不会改变目录修改时间，这种情况需要手动刷新。
+        """
+        key = self._dir_key(dir_path)
+        if key in self._pending_invalidations:
+            return None
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.executemany(
-                    "INSERT OR REPLACE INTO image_metadata (path, width, height, size, mtime) VALUES (?, ?, ?, ?, ?)",
-                    [
-                        (
-                            item["path"],
-                            item["w"],
-                            item["h"],
-                            item["size"],
-                            item["mtime"],
-                        )
-                        for item in items
-                    ],
-                )
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT dir_mtime, scanned_at, files, subdirs FROM directory_snapshot WHERE dir_path = ?",
+                    (key,),
+                ).fetchone()
+            if (
+                not row
+                or abs(row[0] - dir_mtime) >= 0.001
+                or row[1] - row[0] <= DIR_SNAPSHOT_RACY_SECONDS
+            ):
+                return None
+            items = []
+            for name, w, h, size, mtime, embedded in json.loads(row[2]):
+                item = {
+                    "path": os.path.join(dir_path, name),
+                    "w": w,
+                    "h": h,
+                    "size": size,
+                    "mtime": mtime,
+                }
+                if embedded:
+                    item["embedded"] = tuple(embedded)
+                items.append(item)
+            self._touch("directory_snapshot", "dir_path", (key,))
+            return items, json.loads(row[3])
         except Exception as e:
-            print(f"Error saving metadata batch: {e}")
+            print(f"Error getting directory snapshot: {e}")
+            return None
+
+    def save_directory_snapshot(self, dir_path, dir_mtime, items, subdirs):
+        """保存目录快照（排队），dir_mtime 须在列目录之前获取"""
+        files = [
+            [
+                os.path.basename(item["path"]),
+                item["w"],
+                item["h"],
+                item["size"],
+                item["mtime"],
+                item.get("embedded"),
+            ]
+            for item in items
+        ]
+        now = time.time()
+        row = (
+            self._dir_key(dir_path),
+            dir_mtime,
+            now,
+            json.dumps(files, ensure_ascii=False),
+            json.dumps([os.path.basename(d) for d in subdirs], ensure_ascii=False),
+            now,
+        )
+        self._enqueue_write(self._write_snapshot, (row,), max(1, len(files)))
+
+    def _write_snapshot(self, conn, row):
+        conn.execute(
+            "INSERT OR REPLACE INTO directory_snapshot "
+            "(dir_path, dir_mtime, scanned_at, files, subdirs, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            row,
+        )
+
+    def invalidate_directory_snapshot(self, dir_path):
+        """目录内文件被原地修改（如旋转保存）后删除快照
+
+        删除操作排队执行，但在提交前 get_directory_snapshot 已不再返回该快照。
+        """
+        key = self._dir_key(dir_path)
+        with self._connections_lock:
+            self._pending_invalidations[key] = self._pending_invalidations.get(key, 0) + 1
+        self._enqueue_write(self._write_invalidation, (key,))
+
+    def _write_invalidation(self, conn, key):
+        conn.execute("DELETE FROM directory_snapshot WHERE dir_path = ?", (key,))
+
+    # ---------- EXIF 信息 ----------
 
     def save_exif_cache(self, path, exif_info, mtime):
-        """保存 EXIF 信息到缓存（性能优化：加速图片预览信息加载）"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        """保存 EXIF 信息到缓存（排队，不阻塞界面线程）"""
+        row = (
+            path,
+            exif_info.get("width"),
+            exif_info.get("height"),
+            exif_info.get("format"),
+            exif_info.get("camera_make"),
+            exif_info.get("camera_model"),
+            exif_info.get("capture_time"),
+            exif_info.get("iso"),
+            exif_info.get("aperture"),
+            exif_info.get("exposure"),
+            exif_info.get("focal_length"),
+            exif_info.get("lens"),
+            mtime,
+            time.time(),
+        )
+        self._enqueue_write(self._write_exif, (row,))
+
+    def _write_exif(self, conn, row):
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO exif_cache 
+            (path, width, height, format, camera_make, camera_model, capture_time, 
+             iso, aperture, exposure, focal_length, lens, mtime, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            row,
+        )
+        if self._library_tokenizer:
+            dir_path, name = os.path.split(row[0])
+            dir_id = self._lookup_dir_ids(conn, (dir_path,)).get(dir_path)
+            if dir_id is not None:
                 conn.execute(
-                    """
-                    INSERT OR REPLACE INTO exif_cache 
-                    (path, width, height, format, camera_make, camera_model, capture_time, 
-                     iso, aperture, exposure, focal_length, lens, mtime)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        path,
-                        exif_info.get("width"),
-                        exif_info.get("height"),
-                        exif_info.get("format"),
-                        exif_info.get("camera_make"),
-                        exif_info.get("camera_model"),
-                        exif_info.get("capture_time"),
-                        exif_info.get("iso"),
-                        exif_info.get("aperture"),
-                        exif_info.get("exposure"),
-                        exif_info.get("focal_length"),
-                        exif_info.get("lens"),
-                        mtime,
-                    ),
+                    "UPDATE library_fts SET camera = ?, lens = ?, capture_time = ? WHERE rowid = "
+                    "(SELECT doc_id FROM library_docs WHERE dir_id = ? AND name = ?)",
+                    (self._camera_text(row[4], row[5]), row[11], row[6], dir_id, name),
                 )
-        except Exception as e:
-            print(f"Error saving EXIF cache: {e}")
+
+    @staticmethod
+    def _camera_text(make, model):
+        return " ".join(str(v) for v in (make, model) if v)
 
     def get_exif_cache(self, path, mtime):
         """从缓存获取 EXIF 信息（性能优化：加速图片预览信息加载）
@@ -2543,7 +3548,7 @@ class MetadataCache:
             dict: EXIF 信息字典，如果缓存不存在或已过期则返回 None
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.execute(
                     "SELECT width, height, format, camera_make, camera_model, capture_time, "
                     "iso, aperture, exposure, focal_length, lens, mtime FROM exif_cache WHERE path = ?",
@@ -2552,6 +3557,7 @@ class MetadataCache:
                 row = cursor.fetchone()
                 # 修复：浮点数比较使用容差，避免精度问题
                 if row and abs(row[11] - mtime) < 0.001:  # 验证 mtime 是否匹配
+                    self._touch("exif_cache", "path", (path,))
                     return {
                         "width": row[0],
                         "height": row[1],
@@ -2570,35 +3576,847 @@ class MetadataCache:
             print(f"Error getting EXIF cache: {e}")
             return None
 
+    # ---------- 图库搜索 ----------
 
-# 全局缓存实例
-g_metadata_cache = MetadataCache()
+    def _write_library_docs(self, conn, files):
+        """新出现的图片加入全文索引，files 为 [(dir_id, 目录路径, 文件名), ...]"""
+        if not self._library_tokenizer:
+            return
+        for dir_id, dir_path, name in files:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO library_docs (dir_id, name) VALUES (?, ?)",
+                (dir_id, name),
+            )
+            if cursor.rowcount == 1:
+                conn.execute(
+                    "INSERT INTO library_fts (rowid, name, folder) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, name, os.path.basename(dir_path)),
+                )
 
+    def _write_library_unindex(self, conn, dir_id, names=None):
+        """从全文索引删除目录下的图片，names 为 None 时删除整个目录"""
+        if not self._library_tokenizer:
+            return
+        if names is None:
+            conn.execute(
+                "DELETE FROM library_fts WHERE rowid IN "
+                "(SELECT doc_id FROM library_docs WHERE dir_id = ?)",
+                (dir_id,),
+            )
+            conn.execute("DELETE FROM library_docs WHERE dir_id = ?", (dir_id,))
+            return
+        for name in names:
+            row = conn.execute(
+                "SELECT doc_id FROM library_docs WHERE dir_id = ? AND name = ?",
+                (dir_id, name),
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM library_fts WHERE rowid = ?", row)
+                conn.execute("DELETE FROM library_docs WHERE doc_id = ?", row)
+
+    def _write_library_backfill(self, conn):
+        """全文索引刚建立时，把已缓存的图片和 EXIF 一次性加入索引"""
+        exif = {
+            path: (self._camera_text(make, model), lens, capture_time)
+            for path, make, model, lens, capture_time in conn.execute(
+                "SELECT path, camera_make, camera_model, lens, capture_time FROM exif_cache"
+            )
+        }
+        dirs = dict(conn.execute("SELECT dir_id, dir_path FROM directories"))
+        conn.execute(
+            "INSERT OR IGNORE INTO library_docs (dir_id, name) "
+            "SELECT dir_id, name FROM file_metadata"
+        )
+        rows = []
+        for doc_id, dir_id, name in conn.execute(
+            "SELECT doc_id, dir_id, name FROM library_docs"
+        ).fetchall():
+            dir_path = dirs.get(dir_id, "")
+            extra = exif.get(os.path.join(dir_path, name), (None, None, None))
+            rows.append((doc_id, name, os.path.basename(dir_path)) + extra)
+        conn.executemany(
+            "INSERT INTO library_fts (rowid, name, folder, camera, lens, capture_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        if rows:
+            print(f"Indexed {len(rows)} cached images for library search")
 
-# ===================== LRU 图片缓存 (性能优化：防止内存泄漏) =====================
-class LRUImageCache:
-    """LRU缓存实现，限制最大缓存数量，自动淘汰最久未使用的图片"""
+    def search_library(self, text, batch_size=500):
+        """在所有缓存过的文件夹中搜索图片，只读数据库、不访问磁盘
 
-    def __init__(self, max_size=200):
-        self.cache = OrderedDict()
-        self.max_size = max_size
-        self._lock = QMutex()
+        空格分隔的每个关键字都要出现在文件名、文件夹名、相机、镜头或拍摄时间中
+        （不区分大小写）。逐批产出 [(路径, 宽, 高, 大小, 修改时间, 内嵌缩略图), ...]。
+        """
+        terms = text.split()
+        if not terms:
+            return
+        columns = ", ".join(f"f.{c}" for c in self._META_COLUMNS)
+        fields = ("name", "folder", "camera", "lens", "capture_time")
 
-    def get(self, key):
-        with QMutexLocker(self._lock):
-            if key in self.cache:
-                # 移动到末尾（最近使用）
-                self.cache.move_to_end(key)
-                return self.cache[key]
-            return None
+        def like(term):
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return f"%{escaped}%"
 
-    def put(self, key, value):
-        with QMutexLocker(self._lock):
-            if key in self.cache:
-                self.cache.move_to_end(key)
-            self.cache[key] = value
-            if len(self.cache) > self.max_size:
-                # 移除最久未使用的
+        def phrase(term):
+            return '"' + term.replace('"', '""') + '"'
+
+        params = []
+        if self._library_tokenizer:
+            source = (
+                "library_fts s JOIN library_docs k ON k.doc_id = s.rowid "
+                "JOIN file_metadata f ON f.dir_id = k.dir_id AND f.name = k.name"
+            )
+            where = []
+            if self._library_tokenizer == "trigram":
+                # trigram 只能匹配三个字符以上的关键字，更短的用 LIKE 逐行比较
+                match_terms = [phrase(t) for t in terms if len(t) >= 3]
+                short_terms = [t for t in terms if len(t) < 3]
+            else:
+                match_terms = [phrase(t) + "*" for t in terms]  # 按词前缀匹配
+                short_terms = []
+            if match_terms:
+                where.append("library_fts MATCH ?")
+                params.append(" AND ".join(match_terms))
+            for term in short_terms:
+                where.append(
+                    "(" + " OR ".join(f"s.{field} LIKE ? ESCAPE '\\'" for field in fields) + ")"
+                )
+                params.extend([like(term)] * len(fields))
+        else:
+            source = "file_metadata f"
+            where = ["f.name LIKE ? ESCAPE '\\'" for _ in terms]
+            params.extend(like(term) for term in terms)
+        sql = (
+            f"SELECT d.dir_path, f.name, {columns} FROM {source} "
+            "JOIN directories d ON d.dir_id = f.dir_id "
+            f"WHERE {' AND '.join(where)}"
+        )
+        try:
+            cursor = self._connection().execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [
+                    (
+                        os.path.join(row[0], row[1]),
+                        row[2],
+                        row[3],
+                        row[4],
+                        row[5],
+                        row[6:11] if row[6] is not None else None,
+                    )
+                    for row in rows
+                ]
+        except Exception as e:
+            print(f"Error searching library: {e}")
+
+    # ---------- 缓存回收 ----------
+
+    def _database_bytes(self, conn):
+        """返回 (数据库文件字节数, 实际使用的字节数)"""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return page_count * page_size, (page_count - free_pages) * page_size
+
+    # POSIX 上可移动卷的挂载位置 -> 卷根目录在其下的层数（/media/<用户>/<卷>、/mnt/<卷>）
+    _MOUNT_BASES = (("/run/media/", 2), ("/media/", 2), ("/mnt/", 1), ("/Volumes/", 1))
+
+    @classmethod
+    def _volume_root(cls, path):
+        """路径所在的可移动卷：盘符或网络共享根目录、常见挂载点下的卷目录；系统盘上的路径返回空字符串"""
+        drive = os.path.splitdrive(path)[0]
+        if drive:
+            return drive + os.sep
+        for base, depth in cls._MOUNT_BASES:
+            if path.startswith(base):
+                parts = path[len(base):].split("/")
+                if len(parts) >= depth and all(parts[:depth]):
+                    return base + "/".join(parts[:depth])
+                return ""
+        return ""
+
+    def collect_garbage(self, should_stop=None):
+        """清理已不存在的文件，并按最后访问时间淘汰超出预算的记录
+
+        在后台线程调用，只读取；删除和 VACUUM 都经由写线程执行。所在的卷不可用
+        （Windows 盘符或网络共享不存在，/media、/run/media、/mnt、/Volumes 下的卷
+        未挂载）时，目录不会被当作已删除，只受预算淘汰。
+
+        Returns:
+            dict: missing（已删除文件的记录数）、evicted（预算淘汰的记录数）、
+                  bytes_before / bytes_after（数据库文件大小）
+        """
+        should_stop = should_stop or (lambda: False)
+        report = {"missing": 0, "evicted": 0}
+        conn = self._connection()
+        report["bytes_before"] = self._database_bytes(conn)[0]
+
+        volumes = {}
+        listings = {}
+
+        def volume_online(path):
+            root = self._volume_root(path)
+            if not root:
+                return True
+            if root not in volumes:
+                if os.path.splitdrive(root)[0]:
+                    volumes[root] = os.path.isdir(root)
+                else:
+                    # 卸载后挂载点要么被删除，要么只剩空目录
+                    volumes[root] = os.path.ismount(root)
+            return volumes[root]
+
+        def list_dir(dir_path):
+            """目录下的文件名集合；目录已不存在返回 None，无法判断返回 False"""
+            if dir_path in listings:
+                return listings[dir_path]
+            if not volume_online(dir_path):
+                names = False
+            else:
+                try:
+                    names = set(os.listdir(dir_path))
+                except (FileNotFoundError, NotADirectoryError):
+                    names = None
+                except OSError:
+                    names = False
+            listings[dir_path] = names
+            return names
+
+        # 1. 文件或目录已不存在的记录
+        for dir_id, dir_path in conn.execute(
+            "SELECT dir_id, dir_path FROM directories"
+        ).fetchall():
+            if should_stop():
+                return report
+            names = list_dir(dir_path)
+            if names is False:
+                continue
+            cached = [
+                name
+                for (name,) in conn.execute(
+                    "SELECT name FROM file_metadata WHERE dir_id = ?", (dir_id,)
+                )
+            ]
+            if names is None:
+                self._enqueue_write(
+                    self._write_evict_directory, (dir_id, dir_path), len(cached)
+                )
+                report["missing"] += len(cached)
+                continue
+            gone = [name for name in cached if name not in names]
+            if gone:
+                self._enqueue_write(self._write_delete_files, (dir_id, gone), len(gone))
+                report["missing"] += len(gone)
+
+        exif_paths = [path for (path,) in conn.execute("SELECT path FROM exif_cache")]
+        gone = []
+        for dir_path, names in self._group_by_dir(exif_paths).items():
+            if should_stop():
+                return report
+            listed = list_dir(dir_path)
+            if listed is False:
+                continue
+            gone.extend(path for name, path in names.items() if not listed or name not in listed)
+        if gone:
+            self._enqueue_write(self._write_delete_rows, ("exif_cache", "path", gone), len(gone))
+            report["missing"] += len(gone)
+
+        # 快照的键经过 normcase，不能直接用于列目录，只判断目录是否还在
+        gone = []
+        for (key,) in conn.execute("SELECT dir_path FROM directory_snapshot").fetchall():
+            if volume_online(key) and not os.path.isdir(key):
+                gone.append(key)
+        if gone:
+            self._enqueue_write(
+                self._write_delete_rows, ("directory_snapshot", "dir_path", gone), len(gone)
+            )
+            report["missing"] += len(gone)
+        self.flush()
+
+        # 2. 超出行数或大小预算时按最后访问时间淘汰（从未记录访问时间的最先淘汰）
+        if should_stop():
+            return report
+        file_bytes, used_bytes = self._database_bytes(conn)
+        scale = 1.0
+        if used_bytes > METADATA_CACHE_MAX_MB * 1024 * 1024:
+            # 按比例缩减各表，留 10% 余量避免每次都刚好超出
+            scale = METADATA_CACHE_MAX_MB * 1024 * 1024 / used_bytes * 0.9
+
+        files = conn.execute("SELECT COUNT(*) FROM file_metadata").fetchone()[0]
+        excess = files - min(METADATA_CACHE_MAX_FILES, int(files * scale))
+        if excess > 0:
+            for dir_id, dir_path, count in conn.execute(
+                "SELECT d.dir_id, d.dir_path, COUNT(f.name) FROM directories d "
+                "LEFT JOIN file_metadata f ON f.dir_id = d.dir_id "
+                "GROUP BY d.dir_id ORDER BY d.last_access"
+            ).fetchall():
+                if excess <= 0:
+                    break
+                self._enqueue_write(self._write_evict_directory, (dir_id, dir_path), count)
+                report["evicted"] += count
+                excess -= count
+
+        for table, limit in (
+            ("exif_cache", METADATA_CACHE_MAX_EXIF),
+            ("directory_snapshot", METADATA_CACHE_MAX_SNAPSHOTS),
+        ):
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            excess = rows - min(limit, int(rows * scale))
+            if excess > 0:
+                self._enqueue_write(self._write_trim, (table, excess), excess)
+                report["evicted"] += excess
+        self.flush()
+
+        # 3. 增量 VACUUM 和截断 WAL 同样交给写线程，不与排队的写入争用数据库锁
+        self._enqueue_write(self._write_vacuum, (), 0)
+        self.flush()
+        report["bytes_after"] = self._database_bytes(conn)[0]
+        return report
+
+    def _write_vacuum(self, conn):
+        """增量 VACUUM 把空闲页还给文件系统，再截断 WAL 文件
+
+        旧库第一次回收时改为完整 VACUUM，同时让 auto_vacuum=INCREMENTAL 生效。
+        """
+        if self._full_vacuum_pending:
+            # auto_vacuum 是连接级设置，要在执行 VACUUM 的这个连接上设置
+            vacuum = "PRAGMA auto_vacuum=INCREMENTAL; VACUUM"
+        else:
+            vacuum = "PRAGMA incremental_vacuum"
+        try:
+            # execute 只执行一步（释放一页），executescript 会一直执行到完成
+            conn.executescript(f"{vacuum}; PRAGMA wal_checkpoint(TRUNCATE);")
+            self._full_vacuum_pending = False
+        except sqlite3.Error as e:
+            print(f"Error vacuuming metadata cache: {e}")
+
+    def _write_evict_directory(self, conn, dir_id, dir_path):
+        self._write_library_unindex(conn, dir_id)
+        conn.execute("DELETE FROM file_metadata WHERE dir_id = ?", (dir_id,))
+        conn.execute("DELETE FROM directories WHERE dir_id = ?", (dir_id,))
+        conn.execute(
+            "DELETE FROM directory_snapshot WHERE dir_path = ?", (self._dir_key(dir_path),)
+        )
+        self._dir_ids.pop(dir_path, None)
+
+    def _write_delete_files(self, conn, dir_id, names):
+        self._write_library_unindex(conn, dir_id, names)
+        conn.executemany(
+            "DELETE FROM file_metadata WHERE dir_id = ? AND name = ?",
+            [(dir_id, name) for name in names],
+        )
+
+    def _write_delete_rows(self, conn, table, key_column, keys):
+        conn.executemany(
+            f"DELETE FROM {table} WHERE {key_column} = ?", [(key,) for key in keys]
+        )
+
+    def _write_trim(self, conn, table, count):
+        conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} ORDER BY last_access LIMIT ?)",
+            (count,),
+        )
+
+
+# 全局缓存实例：由 init_global_caches() 在主进程中创建
+# 解码子进程（spawn）会重新导入本模块，导入时不能打开数据库或启动写入线程
+g_metadata_cache = None
+
+
+class CacheGCSignals(QObject):
+    finished = pyqtSignal(object)  # 回收报告 dict，中止时为 None
+
+
+class CacheGCTask(QRunnable):
+    """后台回收元数据缓存（清理已删除的文件、按预算淘汰、增量 VACUUM）"""
+
+    def __init__(self):
+        super().__init__()
+        self.signals = CacheGCSignals()
+        self.is_aborted = False
+
+    def abort(self):
+        self.is_aborted = True
+
+    def run(self):
+        report = None
+        try:
+            report = g_metadata_cache.collect_garbage(lambda: self.is_aborted)
+        except Exception as e:
+            print(f"Error collecting metadata cache garbage: {e}")
+        if self.is_aborted:
+            report = None
+        try:
+            self.signals.finished.emit(report)
+        except RuntimeError:
+            pass
+
+
+# ===================== 缩略图磁盘缓存 =====================
+class ThumbnailCache:
+    """缩略图磁盘缓存：按 路径+大小+修改时间+宽度 命名，瀑布流只加载列宽尺寸的小图"""
+
+    def __init__(self):
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        self.cache_dir = os.path.join(data_dir, "thumbnails")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        fmt = THUMBNAIL_FORMAT.upper()
+        if fmt == "WEBP" and not features.check("webp"):
+            fmt = "JPEG"
+        self.format = fmt
+        self.ext = ".webp" if fmt == "WEBP" else ".jpg"
+
+    @staticmethod
+    def bucket_width(width):
+        """宽度按步长向上取整，不同窗口宽度尽量复用同一张缩略图"""
+        step = THUMBNAIL_WIDTH_STEP
+        width = -(-max(1, int(width)) // step) * step
+        return min(width, THUMBNAIL_MAX_WIDTH)
+
+    @staticmethod
+    def _clean_path(path):
+        if sys.platform == "win32" and path.startswith("\\\\?\\"):
+            path = path[4:]
+        return unicodedata.normalize("NFC", os.path.normpath(path))
+
+    def thumb_path(self, path, size, mtime, width):
+        key = f"{os.path.normcase(self._clean_path(path))}|{size}|{mtime:.3f}|{width}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + self.ext)
+
+    def lookup(self, path, size, mtime, width):
+        """命中返回缩略图文件路径，否则返回 None"""
+        thumb = self.thumb_path(path, size, mtime, width)
+        if os.path.exists(thumb):
+            return thumb
+        return None
+
+    def store(self, path, size, mtime, width, pil_image):
+        """缩放已解码（且已校正 EXIF 方向）的图片并写入缓存，返回缩略图路径"""
+        thumb = self.thumb_path(path, size, mtime, width)
+        os.makedirs(os.path.dirname(thumb), exist_ok=True)
+
+        img = pil_image
+        if img.width > width:
+            target_h = max(1, round(img.height * width / img.width))
+            img = process_enhanced_image(img, width, target_h)
+
+        if self.format == "JPEG" or img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha and self.format == "WEBP" else "RGB")
+
+        # 先写临时文件再替换，避免前端读到写了一半的图片
+        tmp = f"{thumb}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp, self.format, quality=THUMBNAIL_QUALITY)
+        os.replace(tmp, thumb)
+        return thumb
+
+    def generate(self, path, size, mtime, width, embedded=None):
+        """命中直接返回，否则解码生成缩略图
+
+        内嵌 EXIF 缩略图宽度足够时只解码内嵌缩略图，不再解码原图。
+        """
+        thumb = self.lookup(path, size, mtime, width)
+        if thumb:
+            return thumb
+        img = g_decode_service.decode(safe_path(path), width, 1 << 30, embedded)
+        return self.store(path, size, mtime, width, img)
+
+    def prune(self):
+        """缓存超出上限时按修改时间淘汰最旧的缩略图"""
+        try:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for f in files:
+                    f_path = os.path.join(root, f)
+                    try:
+                        st = os.stat(f_path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, f_path))
+                    total += st.st_size
+
+            limit = THUMBNAIL_CACHE_MAX_MB * 1024 * 1024
+            if total <= limit:
+                return
+            # 淘汰到上限的 80%，避免频繁触发
+            entries.sort()
+            for _, f_size, f_path in entries:
+                if total <= limit * 0.8:
+                    break
+                try:
+                    os.remove(f_path)
+                    total -= f_size
+                except OSError:
+                    pass
+        except Exception as e:
+            print(f"Error pruning thumbnail cache: {e}")
+
+
+g_thumbnail_cache = None
+
+
+def init_global_caches():
+    """创建元数据缓存和缩略图缓存（只在主进程启动时调用）"""
+    global g_metadata_cache, g_thumbnail_cache
+    if g_metadata_cache is None:
+        g_metadata_cache = MetadataCache()
+    if g_thumbnail_cache is None:
+        g_thumbnail_cache = ThumbnailCache()
+
+
+# ===================== 多进程解码服务 =====================
+def decode_scaled_image(path, fit_w, fit_h, embedded=None):
+    """解码并等比缩小到 fit_w x fit_h 以内（不放大），已按 EXIF 方向校正
+
+    内嵌 EXIF 缩略图宽度足够时只解码内嵌缩略图。
+    """
+    img = None
+    if embedded and embedded_thumbnail_width(embedded) >= fit_w:
+        try:
+            img = load_embedded_thumbnail(path, embedded)
+        except Exception as e:
+            print(f"读取内嵌缩略图失败，改为解码原图: {e}")
+    if img is None:
+        img, _ = open_image_scaled(path, fit_w, fit_h)
+
+    scale = min(fit_w / img.width, fit_h / img.height, 1.0)
+    if scale < 1.0:
+        img = process_enhanced_image(
+            img, max(1, round(img.width * scale)), max(1, round(img.height * scale))
+        )
+    return img
+
+
+def _decode_worker(path, fit_w, fit_h, embedded):
+    """子进程入口：解码缩放后把像素写入共享内存，返回 (名称, 宽, 高, 模式)
+
+    有透明通道时为 RGBA，否则为 RGB（少传 1/4 数据）。
+    """
+    img = decode_scaled_image(path, fit_w, fit_h, embedded)
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    data = img.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[: len(data)] = data
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, img.width, img.height, img.mode
+
+
+class DecodeService:
+    """进程池解码服务，在任意后台线程中同步调用 decode()
+
+    子进程解码 + 缩放，结果经共享内存传回；子进程崩溃（损坏文件触发的段错误等）
+    时重建进程池并重试一次，主程序不受影响。
+    """
+
+    def __init__(self, processes=DECODE_PROCESSES, enabled=USE_PROCESS_DECODER):
+        self.processes = max(1, processes)
+        self.enabled = enabled
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 统一使用 spawn：在已启动 Qt 线程的进程里 fork 不安全
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """丢弃已损坏的进程池，下次调用时重建"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def decode(self, path, fit_w, fit_h, embedded=None):
+        """返回缩放后的 PIL 图片；关闭多进程时在当前线程解码"""
+        if not self.enabled:
+            return decode_scaled_image(path, fit_w, fit_h, embedded)
+
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_decode_worker, path, fit_w, fit_h, embedded)
+                name, w, h, mode = future.result()
+                break
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                if attempt:
+                    raise
+                print(f"解码进程异常退出，重建进程池后重试: {path}")
+
+        shm = shared_memory.SharedMemory(name=name)
+        buf = shm.buf[: w * h * len(mode)]
+        try:
+            return Image.frombytes(mode, (w, h), buf)
+        finally:
+            buf.release()
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+g_decode_service = DecodeService()
+
+
+class ThumbnailSignals(QObject):
+    # 请求序号, 缩略图路径（失败为空）
+    ready = pyqtSignal(int, str)
+
+
+class ThumbnailTask(QRunnable):
+    """后台生成单张缩略图，供 picsee-thumb:// 请求使用"""
+
+    def __init__(self, request_id, path, size, mtime, width, handler, embedded=None):
+        super().__init__()
+        self.request_id = request_id
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.width = width
+        self.handler = handler
+        self.embedded = embedded
+        self.signals = ThumbnailSignals()
+        self.setAutoDelete(True)
+
+    def run(self):
+        # 请求已被 WebEngine 取消（图片节点被移除等），跳过解码
+        if not self.handler.is_pending(self.request_id):
+            return
+        try:
+            thumb = g_thumbnail_cache.generate(
+                self.path, self.size, self.mtime, self.width, self.embedded
+            )
+        except Exception as e:
+            print(f"ThumbnailTask error: {e}")
+            thumb = ""
+        self.signals.ready.emit(self.request_id, thumb)
+
+
+# 原图直出时使用的 MIME 类型
+THUMBNAIL_MIME_TYPES = {
+    ".jpg": b"image/jpeg",
+    ".jpeg": b"image/jpeg",
+    ".png": b"image/png",
+    ".gif": b"image/gif",
+    ".bmp": b"image/bmp",
+    ".tiff": b"image/tiff",
+    ".webp": b"image/webp",
+    ".ico": b"image/x-icon",
+}
+
+
+def register_thumbnail_scheme():
+    """注册 picsee-thumb:// 协议（必须在创建 QApplication 之前调用）"""
+    if not WEBENGINE_AVAILABLE or QWebEngineUrlScheme is None:
+        return
+    scheme = QWebEngineUrlScheme(THUMBNAIL_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(
+        QWebEngineUrlScheme.SecureScheme
+        | QWebEngineUrlScheme.LocalScheme
+        | QWebEngineUrlScheme.LocalAccessAllowed
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class ThumbnailSchemeHandler(QWebEngineUrlSchemeHandler):
+    """picsee-thumb://<id>?w=320：按需返回指定宽度的缩略图
+
+    命中磁盘缓存时直接读取文件返回，未命中时交给后台线程池解码缩放，
+    Chromium 渲染线程不再解码原图。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ids = {}  # 规范化路径 -> id（同一次扫描内 id 不变）
+        self._records = {}  # id -> (path, size, mtime, w, h, embedded)
+        self._next_id = 1
+        self._jobs = {}  # 请求序号 -> 等待回复的 job
+        self._next_request = 1
+        # 解码在进程池中进行，线程只负责等待结果和写缓存文件
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(
+            DECODE_PROCESSES if g_decode_service.enabled else MAX_THREADS
+        )
+
+    def register(self, path, size, mtime, w, h, embedded=None):
+        """登记一张图片，返回前端使用的 id
+
+        embedded 为扫描时记录的内嵌 EXIF 缩略图 (偏移, 字节数, 宽, 高, 方向)
+        """
+        key = os.path.normcase(ThumbnailCache._clean_path(path))
+        image_id = self._ids.get(key)
+        if image_id is None:
+            image_id = self._next_id
+            self._next_id += 1
+            self._ids[key] = image_id
+        self._records[image_id] = (path, size, mtime, w, h, embedded)
+        return image_id
+
+    def reset(self):
+        """开始新的扫描时清空登记，id 继续递增，旧页面的请求不会对上新图片"""
+        self._ids.clear()
+        self._records.clear()
+
+    @staticmethod
+    def _parse_id(url):
+        try:
+            return int(url.host())
+        except (TypeError, ValueError):
+            return None
+
+    def path_for_url(self, url):
+        """由 picsee-thumb:// 地址反查原图路径"""
+        if url.scheme() != THUMBNAIL_SCHEME.decode():
+            return None
+        record = self._records.get(self._parse_id(url))
+        return ThumbnailCache._clean_path(record[0]) if record else None
+
+    def is_pending(self, request_id):
+        return request_id in self._jobs
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        record = self._records.get(self._parse_id(url))
+        if record is None:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+
+        path, size, mtime, w, h, embedded = record
+        try:
+            width = int(QUrlQuery(url).queryItemValue("w") or 0)
+        except ValueError:
+            width = 0
+        width = ThumbnailCache.bucket_width(width or THUMBNAIL_MAX_WIDTH)
+
+        # 动图保留动画；原图不比请求宽度大时直接返回原图
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".gif", ".ico") or w <= width or size is None or mtime is None:
+            self._reply_file(job, ThumbnailCache._clean_path(path))
+            return
+
+        # 磁盘缓存命中：直接读取文件
+        thumb = g_thumbnail_cache.lookup(path, size, mtime, width)
+        if thumb:
+            self._reply_file(job, thumb)
+            return
+
+        # 内嵌缩略图足够大且无需旋转：直接返回原文件中的那段 JPEG 数据
+        if (
+            USE_EMBEDDED_THUMBNAIL
+            and embedded
+            and embedded[4] in (None, 1)
+            and embedded_thumbnail_width(embedded) >= width
+            and self._reply_embedded(job, ThumbnailCache._clean_path(path), embedded)
+        ):
+            return
+
+        request_id = self._next_request
+        self._next_request += 1
+        self._jobs[request_id] = job
+        job.destroyed.connect(lambda *_, rid=request_id: self._jobs.pop(rid, None))
+
+        task = ThumbnailTask(
+            request_id,
+            path,
+            size,
+            mtime,
+            width,
+            self,
+            embedded if USE_EMBEDDED_THUMBNAIL else None,
+        )
+        task.signals.ready.connect(self._on_thumbnail_ready)
+        # 后发起的请求优先处理（通常是当前可视区域的图片）
+        self.pool.start(task, min(request_id, 0x7FFFFFFF))
+
+    def _on_thumbnail_ready(self, request_id, thumb):
+        job = self._jobs.pop(request_id, None)
+        if job is None or sip.isdeleted(job):
+            return
+        if thumb:
+            self._reply_file(job, thumb)
+            return
+        # 生成失败时回退为原图，交给 Chromium 尝试解码
+        url = job.requestUrl()
+        record = self._records.get(self._parse_id(url))
+        if record:
+            self._reply_file(job, ThumbnailCache._clean_path(record[0]))
+        else:
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+
+    def _reply_file(self, job, file_path):
+        # QFile 以 job 为父对象，请求结束时一并释放
+        f = QFile(file_path, job)
+        if not f.open(QIODevice.ReadOnly):
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        ext = os.path.splitext(file_path)[1].lower()
+        job.reply(THUMBNAIL_MIME_TYPES.get(ext, b"image/jpeg"), f)
+
+    def _reply_embedded(self, job, file_path, embedded):
+        """读取内嵌缩略图字节并回复，失败返回 False"""
+        offset, length = embedded[0], embedded[1]
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+        except OSError:
+            return False
+        if len(data) != length or not data.startswith(b"\xff\xd8"):
+            return False
+        buf = QBuffer(job)
+        buf.setData(data)
+        buf.open(QIODevice.ReadOnly)
+        job.reply(b"image/jpeg", buf)
+        return True
+
+
+# ===================== LRU 图片缓存 (性能优化：防止内存泄漏) =====================
+class LRUImageCache:
+    """LRU缓存实现，限制最大缓存数量，自动淘汰最久未使用的图片"""
+
+    def __init__(self, max_size=200):
+        self.cache = OrderedDict()
+        self.max_size = max_size
+        self._lock = QMutex()
+
+    def get(self, key):
+        with QMutexLocker(self._lock):
+            if key in self.cache:
+                # 移动到末尾（最近使用）
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            return None
+
+    def put(self, key, value):
+        with QMutexLocker(self._lock):
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            self.cache[key] = value
+            if len(self.cache) > self.max_size:
+                # 移除最久未使用的
                 self.cache.popitem(last=False)
 
     def clear(self):
@@ -2614,17 +4432,575 @@ class LRUImageCache:
             return len(self.cache)
 
 
+# ===================== 图片列表（列式存储） =====================
+_NATURAL_SORT_SPLIT = re.compile(r"(\d+)")
+
+
+def natural_sort_key(text):
+    """自然排序键：不区分大小写，数字按数值比较（"img2" 排在 "img10" 前面）"""
+    parts = _NATURAL_SORT_SPLIT.split(text.casefold())
+    parts[1::2] = map(int, parts[1::2])
+    return tuple(parts)
+
+
+# 分面筛选：格式分类和文件大小分档。每张图片追加时各算一次编号，0 表示不属于任何一类
+FORMAT_FACETS = ("JPG", "PNG", "GIF", "BMP", "WEBP", "SVG", "RAW")
+RAW_EXTENSIONS = ("arw", "cr2", "cr3", "nef", "dng", "raf", "orf")
+SIZE_FACETS = ("large", "medium", "small")
+_FORMAT_CODES = {name.lower(): code for code, name in enumerate(FORMAT_FACETS, 1)}
+_FORMAT_CODES.update((ext, FORMAT_FACETS.index("RAW") + 1) for ext in RAW_EXTENSIONS)
+
+
+def format_facet_code(name):
+    return _FORMAT_CODES.get(os.path.splitext(name)[1][1:].lower(), 0)
+
+
+def size_facet_code(size):
+    """大图 > 1MB，中图 100KB ~ 1MB，小图 < 100KB"""
+    if size > 1024 * 1024:
+        return 1
+    if size >= 100 * 1024:
+        return 2
+    return 3
+
+
+class ImageStore:
+    """列式存储的图片元数据，替代每张图片一个 dict
+
+    每个字段一个 array；路径拆成 目录前缀表 + 文件名（UTF-8 拼接在一个
+    bytearray 里），同一目录的前缀只存一份。只追加不删除：删除、筛选和
+    排序都只改变 ImageView 里的行号。
+    """
+
+    def __init__(self):
+        self._dirs = []  # 目录前缀（含末尾分隔符）
+        self._dir_index = {}  # 目录前缀 -> 序号
+        self.dir_ids = array("I")
+        self._names = bytearray()  # 文件名 UTF-8 拼接
+        self._name_ends = array("I")
+        self.widths = array("I")
+        self.heights = array("I")
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        # 内嵌缩略图 (偏移, 字节数, 宽, 高, 方向)，字节数为 0 表示没有
+        # RAW 的预览图可能超过 64KB、文件可能超过 4GB，偏移和字节数不能用 16/32 位
+        self.thumb_offsets = array("Q")
+        self.thumb_lengths = array("I")
+        self.thumb_ws = array("H")
+        self.thumb_hs = array("H")
+        self.orientations = array("B")  # 0 表示未知
+        self.columns = {
+            "w": self.widths,
+            "h": self.heights,
+            "size": self.sizes,
+            "mtime": self.mtimes,
+        }
+        # 分面编号（见 FORMAT_FACETS / SIZE_FACETS），筛选时按编号生成位图
+        self.format_codes = array("B")
+        self.size_codes = array("B")
+        self.facets = {"format": self.format_codes, "size": self.size_codes}
+        # 排序字段 -> 按该字段升序排列的行号（排列数组），切换排序时直接复用
+        self._orders = {}
+        self._dir_sort_keys = []  # 目录前缀的自然排序键，按需计算
+        # 按路径查找：开放寻址哈希表，键为 hash(规范化目录序号, 规范化文件名)，
+        # 只存整数数组、不存路径字符串；第一次查找时建立，之后只补上新追加的行
+        self._path_hashes = array("q")  # 每行路径键的 hash
+        self._path_slots = array("I")  # 行号 + 1，0 表示空槽
+        self._path_rows_count = 0
+        self._dir_keys = []  # 目录前缀的规范化键（含末尾分隔符），按需计算
+        self._dir_groups = array("I")  # 目录序号 -> 规范化目录序号（大小写、分隔符不同的前缀合并）
+        self._dir_group_ids = {}  # 目录规范化键 -> 规范化目录序号
+        # 文件名搜索：小写文件名 + 三字母组 -> 行号，扫描线程每处理完一个目录补建一次
+        self._lower_names = []
+        self._trigrams = {}
+        self._name_index_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.dir_ids)
+
+    @staticmethod
+    def _split(path):
+        # 按最后一个分隔符切开，拼回去与原字符串完全一致（不经过 os.path.join）
+        cut = path.rfind(os.sep)
+        if os.altsep:
+            cut = max(cut, path.rfind(os.altsep))
+        return path[: cut + 1], path[cut + 1 :]
+
+    def append(self, path, w, h, size, mtime, embedded=None):
+        """追加一张图片，返回行号"""
+        prefix, name = self._split(path)
+        dir_id = self._dir_index.get(prefix)
+        if dir_id is None:
+            dir_id = self._dir_index[prefix] = len(self._dirs)
+            self._dirs.append(prefix)
+        self.dir_ids.append(dir_id)
+        self._names += name.encode("utf-8", "surrogatepass")
+        self._name_ends.append(len(self._names))
+        self.widths.append(w or 0)
+        self.heights.append(h or 0)
+        self.sizes.append(size or 0)
+        self.mtimes.append(mtime or 0.0)
+        self.thumb_offsets.append(0)
+        self.thumb_lengths.append(0)
+        self.thumb_ws.append(0)
+        self.thumb_hs.append(0)
+        self.orientations.append(0)
+        self.format_codes.append(format_facet_code(name))
+        self.size_codes.append(size_facet_code(size or 0))
+        index = len(self.dir_ids) - 1
+        if embedded:
+            self.set_embedded(index, embedded)
+        return index
+
+    def append_item(self, item):
+        """追加 dict 或其他 ImageStore 的 ImageRecord，返回行号"""
+        return self.append(
+            item["path"],
+            item["w"],
+            item["h"],
+            item.get("size"),
+            item.get("mtime"),
+            item.get("embedded"),
+        )
+
+    def name(self, index):
+        start = self._name_ends[index - 1] if index else 0
+        return self._names[start : self._name_ends[index]].decode("utf-8", "surrogatepass")
+
+    def path(self, index):
+        return self._dirs[self.dir_ids[index]] + self.name(index)
+
+    def embedded(self, index):
+        if not self.thumb_lengths[index]:
+            return None
+        return (
+            self.thumb_offsets[index],
+            self.thumb_lengths[index],
+            self.thumb_ws[index],
+            self.thumb_hs[index],
+            self.orientations[index] or None,
+        )
+
+    def set_embedded(self, index, embedded):
+        offset, length, tw, th, orientation = embedded or (0, 0, 0, 0, 0)
+        if max(tw, th) > 0xFFFF or length > 0xFFFFFFFF:
+            offset = length = tw = th = orientation = 0
+        self.thumb_offsets[index] = offset
+        self.thumb_lengths[index] = length
+        self.thumb_ws[index] = tw
+        self.thumb_hs[index] = th
+        self.orientations[index] = orientation or 0
+
+    def record(self, index):
+        return ImageRecord(self, index)
+
+    # ---------- 分面筛选 ----------
+
+    def facet_mask(self, selected):
+        """分面位图：每行一个字节，同时属于 selected 中所有 (分面, 编号) 的行为 1
+
+        单个分面用 bytes.translate 生成，多个分面转成大整数按位与；
+        selected 为空时返回 None（不筛选）。
+        """
+        result = None
+        for facet, code in selected:
+            table = bytearray(256)
+            table[code] = 1
+            bits = int.from_bytes(self.facets[facet].tobytes().translate(table), "little")
+            result = bits if result is None else result & bits
+        if result is None:
+            return None
+        return result.to_bytes(len(self), "little")
+
+    # ---------- 文件名搜索 ----------
+
+    def update_name_index(self):
+        """把新追加的文件名加入搜索索引；扫描线程和界面线程都可能调用"""
+        with self._name_index_lock:
+            lower_names = self._lower_names
+            trigrams = self._trigrams
+            for index in range(len(lower_names), len(self)):
+                name = self.name(index).lower()
+                lower_names.append(name)
+                for gram in {name[i : i + 3] for i in range(len(name) - 2)}:
+                    rows = trigrams.get(gram)
+                    if rows is None:
+                        rows = trigrams[gram] = array("I")
+                    rows.append(index)
+
+    def name_mask(self, text):
+        """文件名包含 text（不区分大小写）的行为 1 的位图，格式同 facet_mask
+
+        三个字符以上先取各三字母组行号列表的交集作为候选，再逐个确认子串；
+        更短的关键字直接在小写文件名列表上做一遍子串判断。
+        """
+        text = text.lower()
+        self.update_name_index()
+        with self._name_index_lock:
+            lower_names = self._lower_names
+            if len(text) < 3:
+                return bytes(map(str.__contains__, lower_names, repeat(text)))
+            postings = sorted(
+                (self._trigrams.get(text[i : i + 3], ()) for i in range(len(text) - 2)),
+                key=len,
+            )
+            candidates = set(postings[0])
+            for rows in postings[1:]:
+                if len(candidates) <= 64:
+                    break  # 候选已经很少，直接确认子串比继续求交集快
+                candidates.intersection_update(rows)
+            mask = bytearray(len(lower_names))
+            for index in candidates:
+                if text in lower_names[index]:
+                    mask[index] = 1
+            return mask
+
+    # ---------- 按路径查找 ----------
+
+    @staticmethod
+    def path_key(path):
+        """比较路径用的键：去掉长路径前缀、统一分隔符和 Unicode 形式，Windows 下忽略大小写"""
+        return os.path.normcase(ThumbnailCache._clean_path(path))
+
+    @staticmethod
+    def _name_key(name):
+        return os.path.normcase(unicodedata.normalize("NFC", name))
+
+    def _row_matches(self, index, group, name_key):
+        return (
+            self._dir_groups[self.dir_ids[index]] == group
+            and self._name_key(self.name(index)) == name_key
+        )
+
+    def _probe(self, h, group, name_key):
+        """同一键所在的槽，或探查到的第一个空槽"""
+        slots = self._path_slots
+        hashes = self._path_hashes
+        mask = len(slots) - 1
+        slot = h & mask
+        while True:
+            row = slots[slot]
+            if not row or (hashes[row - 1] == h and self._row_matches(row - 1, group, name_key)):
+                return slot
+            slot = (slot + 1) & mask
+
+    def _grow_path_slots(self, count):
+        """装载率保持在一半以下；扩容时原有的键互不相同，直接放进第一个空槽"""
+        size = max(len(self._path_slots), 1024)
+        while size < count * 2:
+            size *= 2
+        if size == len(self._path_slots):
+            return
+        old = self._path_slots
+        slots = self._path_slots = array("I", bytes(4 * size))
+        hashes = self._path_hashes
+        mask = size - 1
+        for row in old:
+            if row:
+                slot = hashes[row - 1] & mask
+                while slots[slot]:
+                    slot = (slot + 1) & mask
+                slots[slot] = row
+
+    def find(self, path):
+        """按路径查找行号，找不到返回 None；同一路径追加过多次时返回最新的一行"""
+        count = len(self)
+        if self._path_rows_count < count:
+            self._grow_path_slots(count)
+            self._dir_path_keys()
+            groups = self._dir_groups
+            dir_ids = self.dir_ids
+            names = self._names
+            name_ends = self._name_ends
+            hashes = self._path_hashes
+            slots = self._path_slots
+            mask = len(slots) - 1
+            normcase = os.path.normcase
+            normalize = unicodedata.normalize
+            start = name_ends[self._path_rows_count - 1] if self._path_rows_count else 0
+            for index in range(self._path_rows_count, count):
+                group = groups[dir_ids[index]]
+                end = name_ends[index]
+                name_key = normcase(normalize("NFC", names[start:end].decode("utf-8", "surrogatepass")))
+                start = end
+                h = hash((group, name_key))
+                hashes.append(h)
+                slot = h & mask
+                if slots[slot]:
+                    slot = self._probe(h, group, name_key)
+                slots[slot] = index + 1
+            self._path_rows_count = count
+        if not count:
+            return None
+
+        prefix, name = self._split(self.path_key(path))
+        group = self._dir_group_ids.get(os.path.join(prefix, ""))
+        if group is None:
+            return None
+        name_key = self._name_key(name)
+        row = self._path_slots[self._probe(hash((group, name_key)), group, name_key)]
+        return row - 1 if row else None
+
+    def _dir_path_keys(self):
+        keys = self._dir_keys
+        while len(keys) < len(self._dirs):
+            key = os.path.join(self.path_key(self._dirs[len(keys)]), "")
+            keys.append(key)
+            group = self._dir_group_ids.get(key)
+            if group is None:
+                group = self._dir_group_ids[key] = len(self._dir_group_ids)
+            self._dir_groups.append(group)
+        return keys
+
+    def dir_ids_under(self, dir_path, recursive=False):
+        """目录 dir_path 下（recursive 时包括各级子目录）的图片所用的目录序号"""
+        scope = os.path.join(self.path_key(dir_path), "")
+        return {
+            dir_id
+            for dir_id, key in enumerate(self._dir_path_keys())
+            if key == scope or (recursive and key.startswith(scope))
+        }
+
+    # ---------- 排序 ----------
+
+    def sort_key(self, field, index):
+        """排序字段：name（先按目录、再按文件名自然排序）、mtime、size"""
+        if field != "name":
+            return self.columns[field][index]
+        dir_id = self.dir_ids[index]
+        while len(self._dir_sort_keys) <= dir_id:
+            self._dir_sort_keys.append(
+                natural_sort_key(self._dirs[len(self._dir_sort_keys)])
+            )
+        return self._dir_sort_keys[dir_id], natural_sort_key(self.name(index))
+
+    def order(self, field):
+        """按字段升序排列的全部行号
+
+        每次扫描只完整排序一次；之后追加的行先自行排序，再二分插入已有的
+        排列数组，只为 O(k log n) 个已有行计算排序键。
+        """
+        if field == "name":
+            key = lambda index: self.sort_key("name", index)  # noqa: E731
+        else:
+            key = self.columns[field].__getitem__
+        count = len(self)
+        perm = self._orders.get(field)
+        if perm is None or len(perm) * 2 < count:
+            perm = array("I", sorted(range(count), key=key))
+        elif len(perm) < count:
+            merged = array("I")
+            start = 0
+            for index in sorted(range(len(perm), count), key=key):
+                value = key(index)
+                lo, hi = start, len(perm)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if value < key(perm[mid]):
+                        hi = mid
+                    else:
+                        lo = mid + 1
+                merged.extend(perm[start:lo])
+                merged.append(index)
+                start = lo
+            merged.extend(perm[start:])
+            perm = merged
+        self._orders[field] = perm
+        return perm
+
+    def invalidate_order(self, field):
+        """字段值被修改（如旋转后文件大小变化）后丢弃对应的排列数组"""
+        self._orders.pop(field, None)
+
+    def view(self):
+        """包含全部图片的视图"""
+        return ImageView(self, range(len(self)))
+
+
+class ImageRecord:
+    """ImageStore 中一行的轻量视图，按 dict 的方式读写（path / w / h / size / mtime / embedded）"""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def get(self, key, default=None):
+        column = self.store.columns.get(key)
+        if column is not None:
+            return column[self.index]
+        if key == "path":
+            return self.store.path(self.index)
+        if key == "embedded":
+            embedded = self.store.embedded(self.index)
+            return default if embedded is None else embedded
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, KeyError) is not KeyError
+
+    def __setitem__(self, key, value):
+        column = self.store.columns.get(key)
+        if column is not None:
+            column[self.index] = value or 0
+            self.store.invalidate_order(key)
+            if key == "size":
+                self.store.size_codes[self.index] = size_facet_code(value or 0)
+        elif key == "embedded":
+            self.store.set_embedded(self.index, value)
+        else:
+            raise KeyError(key)
+
+    def update(self, **fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def pop(self, key, default=None):
+        if key != "embedded":
+            raise KeyError(key)
+        value = self.get(key, default)
+        self.store.set_embedded(self.index, None)
+        return value
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ImageRecord)
+            and other.store is self.store
+            and other.index == self.index
+        )
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+
+class ImageView:
+    """图片列表：ImageStore 的行号数组。筛选、排序、删除只生成新的行号数组，不复制元数据"""
+
+    def __init__(self, store, indices=()):
+        self.store = store
+        self.indices = array("I", indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        store = self.store
+        for index in self.indices:
+            yield ImageRecord(store, index)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return ImageView(self.store, self.indices[position])
+        return ImageRecord(self.store, self.indices[position])
+
+    def _index_of(self, record):
+        if record.store is not self.store:
+            raise ValueError("record belongs to another ImageStore")
+        return record.index
+
+    def append(self, record):
+        self.indices.append(self._index_of(record))
+
+    def insert(self, position, record):
+        self.indices.insert(position, self._index_of(record))
+
+    def extend(self, records):
+        self.indices.extend(self._index_of(record) for record in records)
+
+    def sort(self, key, reverse=False):
+        store = self.store
+        self.indices = array(
+            "I",
+            sorted(
+                self.indices, key=lambda i: key(ImageRecord(store, i)), reverse=reverse
+            ),
+        )
+
+    def sort_by(self, field, reverse=False):
+        """按 ImageStore 缓存的排列数组排序：只挑出本视图包含的行，不再比较"""
+        perm = self.store.order(field)
+        if len(self.indices) == len(perm):
+            # 视图行号互不重复，数量相同即包含全部行
+            indices = array("I", perm)
+        else:
+            member = bytearray(len(perm))
+            for index in self.indices:
+                member[index] = 1
+            indices = array("I", compress(perm, map(member.__getitem__, perm)))
+        if reverse:
+            indices.reverse()
+        self.indices = indices
+
+    def aspect_ratios(self):
+        """按视图顺序返回宽高比（尺寸未知时为 0），瀑布流页面只需要它来排版"""
+        widths, heights = self.store.widths, self.store.heights
+        return [
+            round(widths[i] / heights[i], 4) if heights[i] else 0.0
+            for i in self.indices
+        ]
+
+    def filter(self, predicate):
+        """返回满足条件的新视图"""
+        store = self.store
+        return ImageView(
+            store, (i for i in self.indices if predicate(ImageRecord(store, i)))
+        )
+
+    def select(self, mask):
+        """按 ImageStore.facet_mask 的位图挑选行，保持本视图的顺序"""
+        return ImageView(
+            self.store, compress(self.indices, map(mask.__getitem__, self.indices))
+        )
+
+    def facet_counts(self, facet, codes):
+        """本视图中各分面编号的图片数"""
+        column = self.store.facets[facet]
+        if len(self.indices) == len(column):
+            data = column.tobytes()
+        else:
+            data = bytes(map(column.__getitem__, self.indices))
+        return [data.count(code) for code in codes]
+
+    def without(self, indices):
+        """返回去掉指定行号后的新视图"""
+        return ImageView(self.store, (i for i in self.indices if i not in indices))
+
+
 class ScanSignals(QObject):
-    finished = pyqtSignal(list, int)
+    finished = pyqtSignal(object, int)  # ImageView
     batch_ready = pyqtSignal(list, int)  # 新增信号：分批发送数据
 
 
 class ScanWorker(QRunnable):
-    def __init__(self, dir_path, scan_id, recursive=False):
+    IMG_EXTENSIONS = (
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".gif",
+        ".bmp",
+        ".tiff",
+        ".webp",
+        ".ico",
+    )
+
+    # 递归扫描共用的列目录线程池：线程常驻，各线程的 SQLite 连接可以一直复用
+    _walk_executor = None
+    _walk_executor_lock = threading.Lock()
+
+    def __init__(self, dir_path, scan_id, recursive=False, use_snapshot=True):
         super().__init__()
         self.dir_path = dir_path
         self.scan_id = scan_id
         self.recursive = recursive
+        self.use_snapshot = use_snapshot  # 手动刷新时为 False，强制重新列目录
+        self.store = ImageStore()  # 扫描结果直接写入列式存储，不保留逐张图片的 dict
         self.signals = ScanSignals()
         self.setAutoDelete(True)
         self.is_aborted = False
@@ -2632,76 +5008,151 @@ class ScanWorker(QRunnable):
     def abort(self):
         self.is_aborted = True
 
+    def _scan_directory(self, root):
+        """列出一个目录，返回 (图片文件信息列表, 子目录列表, 目录修改时间, 是否来自快照)
+
+        目录修改时间与快照一致时直接返回快照中的完整元数据（一次 stat + 一次查询）；
+        否则用 os.scandir 列出，文件类型和大小/修改时间直接取自 DirEntry：
+        Windows 上不需要额外的系统调用，其他平台每个图片文件只 stat 一次。
+        """
+        try:
+            dir_mtime = os.stat(root).st_mtime
+        except OSError:
+            return [], [], None, False
+
+        if self.use_snapshot:
+            snapshot = g_metadata_cache.get_directory_snapshot(root, dir_mtime)
+            if snapshot is not None:
+                items, subdir_names = snapshot
+                subdirs = [os.path.join(root, name) for name in subdir_names]
+                return items, subdirs, dir_mtime, True
+
+        file_info_list = []
+        subdirs = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if self.is_aborted:
+                        break
+                    try:
+                        if entry.is_dir():
+                            # 与 os.walk 一致：不进入符号链接目录
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                        if not entry.name.lower().endswith(self.IMG_EXTENSIONS):
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    file_info_list.append(
+                        {
+                            "path": entry.path,
+                            "name": entry.name,
+                            "size": st.st_size,
+                            "mtime": st.st_mtime,
+                        }
+                    )
+        except OSError:
+            return file_info_list, subdirs, None, False
+        # 中途中止的目录列表不完整，不能保存为快照
+        return file_info_list, subdirs, None if self.is_aborted else dir_mtime, False
+
+    @classmethod
+    def _walk_pool(cls):
+        with cls._walk_executor_lock:
+            if cls._walk_executor is None:
+                cls._walk_executor = ThreadPoolExecutor(
+                    max_workers=SCAN_WALK_THREADS, thread_name_prefix="PicSeeScan"
+                )
+            return cls._walk_executor
+
+    def _walk(self, scan_path):
+        """逐个目录产出 (目录, 图片文件信息列表, 子目录列表, 目录修改时间, 是否来自快照)
+
+        非递归模式只扫描当前目录；递归模式把子目录分发给线程池并行列出，
+        哪个目录先完成就先产出，顺序不再固定。
+        """
+        if not self.recursive or SCAN_WALK_THREADS <= 1:
+            stack = [scan_path]
+            while stack and not self.is_aborted:
+                root = stack.pop()
+                result = self._scan_directory(root)
+                if self.recursive:
+                    stack.extend(reversed(result[1]))
+                yield (root,) + result
+            return
+
+        executor = self._walk_pool()
+        pending = {}
+        try:
+            pending[executor.submit(self._scan_directory, scan_path)] = scan_path
+            while pending and not self.is_aborted:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root = pending.pop(future)
+                    result = future.result()
+                    if self.is_aborted:
+                        return
+                    for subdir in result[1]:
+                        pending[executor.submit(self._scan_directory, subdir)] = subdir
+                    yield (root,) + result
+        finally:
+            # 中止时取消本次扫描尚未开始的目录，正在列出的目录会检查 is_aborted 尽快退出
+            for future in pending:
+                future.cancel()
+
     def run(self):
-        img_data = []
+        store = self.store
         batch_data = []  # 临时存储当前批次
         cache_save_batch = []  # 待写入缓存的批次
         current_batch_size = 10  # 初始批次较小，以便快速看到第一批图
         max_batch_size = 100  # 随着加载进行，增加批次大小以提高效率
 
-        img_extensions = (
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".gif",
-            ".bmp",
-            ".tiff",
-            ".webp",
-            ".ico",
-        )
         try:
-            # os.walk works with \\\\?\\ paths on Windows
+            # os.scandir works with \\\\?\\ paths on Windows
             scan_path = self.dir_path
 
             # Print scan path for debug
 
             # Ensure scan_path exists and is a directory
             if not os.path.exists(scan_path):
-                self.signals.finished.emit([], self.scan_id)
+                self.signals.finished.emit(ImageView(store), self.scan_id)
                 return
 
-            if self.recursive:
-                walker = os.walk(scan_path)
-            else:
-                # Non-recursive: only scan the current directory
-                try:
-                    all_files = os.listdir(scan_path)
-                    files = [
-                        f
-                        for f in all_files
-                        if os.path.isfile(os.path.join(scan_path, f))
-                    ]
-                    walker = [(scan_path, [], files)]
-                except Exception as e:
-                    walker = []
-
             count = 0
-            for root, _, files in walker:
+            for root, file_info_list, subdirs, dir_mtime, from_snapshot in self._walk(
+                scan_path
+            ):
                 if self.is_aborted:
                     return
 
-                # 过滤出图片文件
-                img_files = [f for f in files if f.lower().endswith(img_extensions)]
-                if not img_files:
+                # 0. 目录快照命中：快照中已有完整元数据，不再逐个查询和 stat
+                if from_snapshot:
+                    for info in file_info_list:
+                        batch_data.append(store.record(store.append_item(info)))
+                        count += 1
+                        if len(batch_data) >= current_batch_size:
+                            self.signals.batch_ready.emit(batch_data, self.scan_id)
+                            batch_data = []
+                            if current_batch_size < max_batch_size:
+                                current_batch_size = min(
+                                    max_batch_size, current_batch_size + 10
+                                )
                     continue
 
-                # 构建完整路径并获取文件状态（用于校验缓存是否失效）
-                file_info_list = []
-                for f in img_files:
-                    if self.is_aborted:
-                        return
-                    f_path = os.path.join(root, f)
-                    try:
-                        st = os.stat(f_path)
-                        file_info_list.append(
-                            {"path": f_path, "size": st.st_size, "mtime": st.st_mtime}
-                        )
-                    except:
-                        continue
+                dir_items = []  # 本目录的完整元数据，用于保存目录快照
 
-                # 1. 批量从缓存读取元数据
-                all_paths = [info["path"] for info in file_info_list]
-                cached_data = g_metadata_cache.get_metadata_batch(all_paths)
+                # 1. 一次范围查询读出本目录的缓存元数据（文件名 -> 元数据）
+                cached_data = (
+                    g_metadata_cache.get_directory_metadata(
+                        os.path.dirname(file_info_list[0]["path"])
+                    )
+                    if file_info_list
+                    else {}
+                )
 
                 for info in file_info_list:
                     if self.is_aborted:
@@ -2713,18 +5164,15 @@ class ScanWorker(QRunnable):
 
                     # 检查缓存命中且未过期
                     hit = False
-                    if file_path in cached_data:
-                        c_w, c_h, c_size, c_mtime = cached_data[file_path]
+                    if info["name"] in cached_data:
+                        c_w, c_h, c_size, c_mtime, c_embedded = cached_data[info["name"]]
                         if c_size == size_val and abs(c_mtime - mtime_val) < 0.01:
-                            w, h = c_w, c_h
-                            item = {
-                                "path": file_path,
-                                "w": w,
-                                "h": h,
-                                "size": size_val,
-                                "mtime": mtime_val,
-                            }
-                            img_data.append(item)
+                            item = store.record(
+                                store.append(
+                                    file_path, c_w, c_h, size_val, mtime_val, c_embedded
+                                )
+                            )
+                            dir_items.append(item)
                             batch_data.append(item)
                             count += 1
                             hit = True
@@ -2740,29 +5188,20 @@ class ScanWorker(QRunnable):
                                 )
                         continue
 
-                    # 2. 缓存失效或不存在，使用 Pillow 解析
+                    # 2. 缓存失效或不存在，只解析文件头（无法识别时改用 Pillow）
                     try:
-                        # Use Pillow instead of QImageReader
-                        with Image.open(file_path) as img:
-                            w, h = img.size
-                            # Handle EXIF Orientation
-                            try:
-                                exif = img._getexif()
-                                if exif:
-                                    orientation = exif.get(274)  # 274 is Orientation
-                                    if orientation in (5, 6, 7, 8):
-                                        w, h = h, w
-                            except:
-                                pass
-
-                        item = {
-                            "path": file_path,
-                            "w": w,
-                            "h": h,
-                            "size": size_val,
-                            "mtime": mtime_val,
-                        }
-                        img_data.append(item)
+                        header = sniff_image_header(file_path)
+                        if header is None:
+                            header = read_image_header_pillow(file_path)
+                        w, h, orientation, thumb_info = header
+                        if orientation in (5, 6, 7, 8):
+                            w, h = h, w
+                        embedded = thumb_info + (orientation,) if thumb_info else None
+
+                        item = store.record(
+                            store.append(file_path, w, h, size_val, mtime_val, embedded)
+                        )
+                        dir_items.append(item)
                         batch_data.append(item)
                         cache_save_batch.append(item)
                         count += 1
@@ -2784,18 +5223,33 @@ class ScanWorker(QRunnable):
                     except Exception:
                         pass
 
+                # 3. 本目录处理完毕，保存目录快照
+                if dir_mtime is not None and not self.is_aborted:
+                    g_metadata_cache.save_directory_snapshot(
+                        root, dir_mtime, dir_items, subdirs
+                    )
+
+                # 4. 在扫描线程里补建文件名搜索索引
+                store.update_name_index()
+
+            if self.is_aborted:
+                return
+
             # 发送剩余的批次数据
             if batch_data:
                 self.signals.batch_ready.emit(batch_data, self.scan_id)
 
+            # 快照命中的目录不经过上面的第 4 步
+            store.update_name_index()
+
             # 保存剩余的缓存数据
             if cache_save_batch:
                 g_metadata_cache.save_metadata_batch(cache_save_batch)
 
-            self.signals.finished.emit(img_data, self.scan_id)
+            self.signals.finished.emit(store.view(), self.scan_id)
         except Exception as e:
             traceback.print_exc()
-            self.signals.finished.emit([], self.scan_id)
+            self.signals.finished.emit(ImageView(store), self.scan_id)
 
     def _safe_read_size(self, reader):
         try:
@@ -2804,6 +5258,35 @@ class ScanWorker(QRunnable):
             return QSize(0, 0)
 
 
+class LibrarySearchWorker(QRunnable):
+    """在元数据缓存的全文索引中搜索所有扫描过的文件夹，信号与 ScanWorker 相同"""
+
+    def __init__(self, query, scan_id):
+        super().__init__()
+        self.query = query
+        self.scan_id = scan_id
+        self.signals = ScanSignals()
+        self.store = ImageStore()
+        self.is_aborted = False
+
+    def abort(self):
+        self.is_aborted = True
+
+    def run(self):
+        store = self.store
+        try:
+            for rows in g_metadata_cache.search_library(self.query):
+                if self.is_aborted:
+                    return
+                batch = [store.record(store.append(*row)) for row in rows]
+                self.signals.batch_ready.emit(batch, self.scan_id)
+            store.update_name_index()
+            self.signals.finished.emit(store.view(), self.scan_id)
+        except Exception:
+            traceback.print_exc()
+            self.signals.finished.emit(ImageView(store), self.scan_id)
+
+
 # 图像处理函数（仅缩放，移除增强）
 def process_enhanced_image(pil_image, target_w, target_h):
     """
@@ -2812,7 +5295,11 @@ def process_enhanced_image(pil_image, target_w, target_h):
     try:
         # 使用 Lanczos (兰索斯) 算法进行高质量缩放
         resample_method = getattr(Image.Resampling, "LANCZOS", Image.LANCZOS)
-        hq_img = pil_image.resize((target_w, target_h), resample_method)
+        # 大幅缩小时先按整数倍 reduce，再用 Lanczos 精细缩放
+        reducing_gap = REDUCING_GAP if FAST_DOWNSCALE_DECODE else None
+        hq_img = pil_image.resize(
+            (target_w, target_h), resample_method, reducing_gap=reducing_gap
+        )
         return hq_img
     except Exception as e:
         print(f"图像处理失败: {e}")
@@ -2821,16 +5308,18 @@ def process_enhanced_image(pil_image, target_w, target_h):
 
 # 扩展 WorkerSignals 以支持预览加载
 class PreviewWorkerSignals(QObject):
-    # path, q_img, scale_factor, pil_image
-    result = pyqtSignal(str, QImage, float, object)
+    # path, q_img, scale_factor, pil_image, original_size
+    result = pyqtSignal(str, QImage, float, object, object)
 
 
 class PreviewLoadTask(QRunnable):
-    def __init__(self, path, view_width, view_height):
+    def __init__(self, path, view_width, view_height, keep_original=True):
         super().__init__()
         self.path = safe_path(path)
         self.view_width = view_width
         self.view_height = view_height
+        # 需要保留全尺寸 PIL 对象用于后续缩放时完整解码，否则只按视口尺寸降采样解码
+        self.keep_original = keep_original
         self.signals = PreviewWorkerSignals()
         self.setAutoDelete(True)
 
@@ -2839,22 +5328,25 @@ class PreviewLoadTask(QRunnable):
             if not os.path.exists(self.path):
                 return
 
-            pil_image = Image.open(self.path)
-            pil_image = ImageOps.exif_transpose(pil_image)
+            available_w = max(100, self.view_width - 160)
+            available_h = max(100, self.view_height - 60)
+
+            pil_image, (orig_w, orig_h) = open_image_scaled(
+                self.path,
+                available_w,
+                available_h,
+                fast=False if self.keep_original else None,
+            )
             if pil_image.mode not in ["RGB", "RGBA"]:
                 pil_image = pil_image.convert(
                     "RGB" if pil_image.mode != "RGBA" else "RGBA"
                 )
 
-            available_w = max(100, self.view_width - 160)
-            available_h = max(100, self.view_height - 60)
-
-            scale_w = available_w / pil_image.width
-            scale_h = available_h / pil_image.height
-            scale_factor = min(scale_w, scale_h, 1.0)
+            # 缩放比例始终相对原图尺寸计算
+            scale_factor = min(available_w / orig_w, available_h / orig_h, 1.0)
 
-            target_w = int(pil_image.width * scale_factor)
-            target_h = int(pil_image.height * scale_factor)
+            target_w = min(pil_image.width, max(1, int(orig_w * scale_factor)))
+            target_h = min(pil_image.height, max(1, int(orig_h * scale_factor)))
 
             enhanced_img = process_enhanced_image(pil_image, target_w, target_h)
 
@@ -2879,7 +5371,13 @@ class PreviewLoadTask(QRunnable):
                 if sys.platform == "win32"
                 else self.path
             )
-            self.signals.result.emit(original_path, q_img, scale_factor, pil_image)
+            self.signals.result.emit(
+                original_path,
+                q_img,
+                scale_factor,
+                pil_image if self.keep_original else None,
+                (orig_w, orig_h),
+            )
 
         except Exception as e:
             print(f"后台加载预览失败: {e}")
@@ -3436,6 +5934,10 @@ class TreeStyle(QProxyStyle):
 class PreviewWebEngineView(QWebEngineView):
     """用于图片预览的专用 WebEngineView，拦截滚轮事件以驱动 PhotoSwipe"""
 
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.bridge = install_web_bridge(self)
+
     def contextMenuEvent(self, event):
         # 禁用默认右键菜单，防止干扰
         pass
@@ -3606,8 +6108,9 @@ class HighQualityImagePreviewDialog(QDialog):
             qurl.setQuery(f"t={int(time.time())}")
             self.web_view.load(qurl)
 
-            # 监听标题变化以处理关闭请求
-            self.web_view.titleChanged.connect(self._on_web_title_changed)
+            # 页面中 PhotoSwipe 关闭时通过通信桥请求关闭窗口
+            if self.web_view.bridge:
+                self.web_view.bridge.sig_close_requested.connect(self.close)
 
             # 页面加载状态追踪
             self.is_web_loaded = False
@@ -4200,7 +6703,13 @@ class HighQualityImagePreviewDialog(QDialog):
             self.pil_image = None
 
             # 启动后台加载任务
-            task = PreviewLoadTask(self.valid_img_path, self.width(), self.height())
+            # Web 模式只需要显示尺寸和原图宽高，不保留全尺寸 PIL 对象
+            task = PreviewLoadTask(
+                self.valid_img_path,
+                self.width(),
+                self.height(),
+                keep_original=not self.use_web,
+            )
             task.signals.result.connect(self._on_preview_loaded)
             self.thread_pool.start(task)
 
@@ -4212,7 +6721,14 @@ class HighQualityImagePreviewDialog(QDialog):
             traceback.print_exc()
 
     def _on_preview_loaded(
-        self, path, q_img=None, scale_factor=1.0, pil_image=None, *args, **kwargs
+        self,
+        path,
+        q_img=None,
+        scale_factor=1.0,
+        pil_image=None,
+        original_size=None,
+        *args,
+        **kwargs,
     ):
         """预览图加载完成回调（增强健壮性，兼容不同参数签名）"""
         try:
@@ -4240,16 +6756,19 @@ class HighQualityImagePreviewDialog(QDialog):
                 js_path = path.replace("\\", "/") if path else ""
                 if not js_path.startswith("file:///"):
                     js_path = "file:///" + js_path
-                w = (
-                    pil_image.width
-                    if pil_image and hasattr(pil_image, "width")
-                    else enhanced_pixmap.width()
-                )
-                h = (
-                    pil_image.height
-                    if pil_image and hasattr(pil_image, "height")
-                    else enhanced_pixmap.height()
-                )
+                if original_size:
+                    w, h = original_size
+                else:
+                    w = (
+                        pil_image.width
+                        if pil_image and hasattr(pil_image, "width")
+                        else enhanced_pixmap.width()
+                    )
+                    h = (
+                        pil_image.height
+                        if pil_image and hasattr(pil_image, "height")
+                        else enhanced_pixmap.height()
+                    )
 
                 if self.is_web_loaded:
                     self._trigger_web_image(js_path, w, h)
@@ -4560,10 +7079,6 @@ class HighQualityImagePreviewDialog(QDialog):
             js_code = f"if(window.openImage) openImage('{js_path}', {w}, {h}, {thumb_rect_json}, 1.0);"
             self.web_view.page().runJavaScript(js_code)
 
-    def _on_web_title_changed(self, title):
-        if title == "action:close":
-            self.close()
-
     def keyPressEvent(self, event):
         """统一键盘事件处理"""
         try:
@@ -4648,9 +7163,11 @@ class AdaptiveWaterfallWidget(QWidget):
         self.horizontal_layout.setContentsMargins(*WIDGET_MARGINS)
         self.main_layout.addWidget(self.waterfall_container)
 
-        # 线程池
+        # 线程池（解码在进程池中进行时线程只等待结果，可按进程数放开）
         self.thread_pool = QThreadPool()
-        self.thread_pool.setMaxThreadCount(MAX_THREADS)
+        self.thread_pool.setMaxThreadCount(
+            DECODE_PROCESSES if g_decode_service.enabled else MAX_THREADS
+        )
 
         # 调整大小防抖动定时器
         self.resize_timer = QTimer(self)
@@ -4997,6 +7514,27 @@ class ImageViewerWindow(QMainWindow):
         self.thread_pool = QThreadPool()
         self.thread_pool.setMaxThreadCount(MAX_THREADS)
 
+        # 监视当前目录，外部程序增删改图片时只向前端发送增量
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self._on_watched_directory_changed)
+        self._watch_overflow = False  # 监视数量超限时只监视根目录，变化时整体重新扫描
+        self._changed_dirs = set()
+        self._watch_scans = {}  # 增量扫描序号 -> (目录, 主扫描序号)
+        self._next_watch_scan = 1
+        self._watch_timer = QTimer(self)
+        self._watch_timer.setSingleShot(True)
+        self._watch_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self._watch_timer.timeout.connect(self._process_directory_changes)
+
+        # 元数据缓存回收：空闲一段时间（没有扫描）后在后台执行
+        self._gc_task = None
+        self._gc_timer = QTimer(self)
+        self._gc_timer.setSingleShot(True)
+        self._gc_timer.setInterval(METADATA_GC_IDLE_MS)
+        self._gc_timer.timeout.connect(self._start_cache_gc)
+        self._gc_timer.timeout.connect(self._request_web_stats)
+        self._gc_timer.start()
+
         # 用于节流通知 Web 端宽度变化的定时器
         self._splitter_timer = QTimer()
         self._splitter_timer.setSingleShot(True)
@@ -5136,6 +7674,15 @@ class ImageViewerWindow(QMainWindow):
             self.web_view.sig_format_changed.connect(self._change_format_filter)
             self.web_view.sig_size_changed.connect(self._change_size_filter)
 
+            # 页面消息（分页请求、点击、EXIF 请求、加载统计）经 QWebChannel 通信桥送达
+            # 文件操作只走右键菜单，页面不能直接移动或删除文件
+            if self.web_view.bridge:
+                bridge = self.web_view.bridge
+                bridge.sig_images_requested.connect(self._on_web_images_requested)
+                bridge.sig_image_clicked.connect(self._on_web_image_clicked)
+                bridge.sig_exif_requested.connect(self._on_web_exif_requested)
+                bridge.sig_stats_reported.connect(self._on_web_stats_reported)
+
             # 加载本地 HTML
             html_path = resource_path("waterfall.html").replace("\\", "/")
             qurl = QUrl.fromLocalFile(html_path)
@@ -5172,8 +7719,9 @@ class ImageViewerWindow(QMainWindow):
         self.status_bar.addWidget(self.progress_label)
 
         self.image_count = 0  # 记录当前图片总数
-        self.original_img_data = []  # 原始图片数据（用于过滤）
-        self.current_img_data = []  # 当前图片数据（过滤后）
+        self.is_library_search = False  # 当前显示的是图库搜索结果（而不是某个文件夹）
+        self.original_img_data = ImageView(ImageStore())  # 原始图片数据（用于过滤）
+        self.current_img_data = self.original_img_data  # 当前图片数据（过滤后）
         self.current_sort_mode = "name_asc"  # 当前排序模式
         self.current_layout_mode = "vertical"  # 当前布局模式
 
@@ -5185,6 +7733,8 @@ class ImageViewerWindow(QMainWindow):
         # 浮动搜索框
         self.floating_search = FloatingSearchBox(self, is_dark=self.is_dark_theme)
         self.floating_search.sig_search.connect(self._on_floating_search)
+        self.floating_search.sig_library_search.connect(self._search_library)
+        self.floating_search.set_library_text(t["search_library"], t["search_library_tip"])
         self.last_ctrl_press_time = 0
 
         # 图片大小标签 (居中显示)
@@ -5201,8 +7751,6 @@ class ImageViewerWindow(QMainWindow):
         self.status_bar.addPermanentWidget(self.count_label)
 
         # 事件绑定
-        if self.web_view:
-            self.web_view.titleChanged.connect(self._on_web_title_changed)
         self.tree_view.clicked.connect(self._safe_dir_click)
         self.splitter.setSizes([300, DEFAULT_WIDTH - 300])  # 初始宽度300px
         # 设置拉伸因子：index 0 (左侧) 为 0 (固定)，index 1 (右侧) 为 1 (可拉伸)
@@ -5295,6 +7843,9 @@ class ImageViewerWindow(QMainWindow):
         # 工具栏
         if hasattr(self, "floating_search"):
             self.floating_search.input.setPlaceholderText(t["search_placeholder"])
+            self.floating_search.set_library_text(
+                t["search_library"], t["search_library_tip"]
+            )
 
         # 扫描模式和工具提示
         mode_text = (
@@ -5396,12 +7947,9 @@ class ImageViewerWindow(QMainWindow):
                 except Exception as e:
                     print(f"Error reading image details: {e}")
 
-            # 发送给 JS
-            # 需要转义 JSON 中的引号等
-            json_str = json.dumps(info).replace("\\", "\\\\").replace("'", "\\'")
-            self.web_view.page().runJavaScript(
-                f"if (typeof showExifInfo === 'function') {{ showExifInfo('{json_str}'); }}"
-            )
+            # 经通信桥发送给页面，不再需要手工转义 JSON
+            if self.web_view.bridge:
+                self.web_view.bridge.post("exif_info", info)
 
         except Exception as e:
             print(f"Error in _send_exif_info: {e}")
@@ -5411,54 +7959,16 @@ class ImageViewerWindow(QMainWindow):
         if not self.original_img_data:
             return
 
-        t = TRANSLATIONS[self.lang]
-        search_text = self.current_search_text.strip().lower()
-        format_filter = self.current_format_filter
-        size_filter = self.current_size_filter
-
-        filtered_data = []
-
-        for img in self.original_img_data:
-            path = img.get("path", "")
-            if not path:
-                continue
-
-            filename = os.path.basename(path).lower()
-
-            # 1. 搜索文件名
-            if search_text and search_text not in filename:
-                continue
-
-            # 2. 格式筛选
-            if format_filter != t["all_formats"]:
-                ext = os.path.splitext(filename)[1].lower().replace(".", "")
-                if format_filter == "RAW":
-                    if ext not in ["arw", "cr2", "cr3", "nef", "dng", "raf", "orf"]:
-                        continue
-                elif format_filter.lower() != ext:
-                    continue
-
-            # 3. 尺寸筛选
-            if size_filter != t["all_sizes"]:
-                try:
-                    # 优先使用缓存的 size
-                    size = img.get("size")
-                    if size is None:
-                        size = os.path.getsize(path)
-
-                    if size_filter == t["large_img"]:
-                        if size <= 1024 * 1024:
-                            continue
-                    elif size_filter == t["medium_img"]:
-                        if size < 100 * 1024 or size > 1024 * 1024:
-                            continue
-                    elif size_filter == t["small_img"]:
-                        if size >= 100 * 1024:
-                            continue
-                except:
-                    continue
-
-            filtered_data.append(img)
+        # 格式 / 尺寸用分面位图一次挑出，只有文件名搜索需要逐张比较
+        filtered_data = self.original_img_data[:]
+        mask = filtered_data.store.facet_mask(self._facet_filters())
+        if mask is not None:
+            filtered_data = filtered_data.select(mask)
+        search_text = self.current_search_text.strip()
+        if search_text:
+            filtered_data = filtered_data.select(
+                filtered_data.store.name_mask(search_text)
+            )
 
         self.current_img_data = filtered_data
 
@@ -5467,8 +7977,44 @@ class ImageViewerWindow(QMainWindow):
 
         self._update_web_view_images()
 
+    def _facet_filters(self):
+        """当前格式 / 尺寸筛选对应的 (分面, 编号) 列表"""
+        t = TRANSLATIONS[self.lang]
+        selected = []
+        if self.current_format_filter != t["all_formats"]:
+            selected.append(("format", _FORMAT_CODES.get(self.current_format_filter.lower(), 0)))
+        size_labels = (t["large_img"], t["medium_img"], t["small_img"])
+        if self.current_size_filter in size_labels:
+            selected.append(("size", size_labels.index(self.current_size_filter) + 1))
+        return selected
+
+    def _facet_counts(self):
+        """格式 / 尺寸筛选菜单上显示的图片数：{菜单文字: 数量}"""
+        t = TRANSLATIONS[self.lang]
+        view = self.original_img_data
+        counts = {t["all_formats"]: len(view), t["all_sizes"]: len(view)}
+        size_labels = (t["large_img"], t["medium_img"], t["small_img"])
+        for facet, labels in (("format", FORMAT_FACETS), ("size", size_labels)):
+            codes = range(1, len(labels) + 1)
+            counts.update(zip(labels, view.facet_counts(facet, codes)))
+        return counts
+
+    def _matches_search(self, img):
+        """文件名是否包含搜索关键字"""
+        search_text = self.current_search_text.strip().lower()
+        return search_text in os.path.basename(img["path"]).lower()
+
+    def _matches_filters(self, img):
+        """图片是否符合当前的搜索和筛选条件"""
+        for facet, code in self._facet_filters():
+            if img.store.facets[facet][img.index] != code:
+                return False
+        return not self.current_search_text.strip() or self._matches_search(img)
+
     def _on_floating_search(self, text):
         """处理浮动搜索框的搜索请求"""
+        if text == self.current_search_text:
+            return  # 防抖查询已经执行过，回车时不再重复刷新
         self.current_search_text = text
         self._on_search_filter_changed()
 
@@ -5574,106 +8120,65 @@ class ImageViewerWindow(QMainWindow):
                     f"if (typeof setAppWindowWidth === 'function') {{ setAppWindowWidth({self.web_view.width()}); }}"
                 )
 
-    def _on_web_title_changed(self, title):
-        """处理 Web 标题变化（用于接收 JS 消息）"""
-        try:
-            # 优先处理关闭信号（如果有）
-            if title == "action:close":
-                self.close()
-                return
-
-            if not title:
-                return
-
-            # 处理 EXIF 请求 (exif:path|timestamp)
-            if title.startswith("exif:"):
-                try:
-                    content = title[5:]
-                    # 去除可能的时间戳后缀
-                    if "|" in content:
-                        content = content.split("|")[0]
-
-                    path = content
-                    # 路径处理
-                    if path.startswith("file:///"):
-                        path = path[8:]
-                    if sys.platform == "win32":
-                        path = path.replace("/", "\\")
-                    from urllib.parse import unquote
-
-                    path = unquote(path)
-
-                    full_path = safe_path(path)
-                    if os.path.exists(full_path):
-                        self._send_exif_info(full_path)
-                except Exception as e:
-                    print(f"Error handling EXIF request: {e}")
-                return
-
-            if not title.startswith("clicked:"):
-                return
+    @staticmethod
+    def _from_web_path(path):
+        """把页面传回的路径还原为本地路径（去掉 file:/// 前缀和 URL 编码）"""
+        if path.startswith("file:///"):
+            path = path[8:]
+        if sys.platform == "win32":
+            path = path.replace("/", "\\")
+        if not os.path.exists(path):
+            from urllib.parse import unquote
 
-            # 提取路径 (clicked:path|index|timestamp)
-            try:
-                content = title[8:]
-                parts = content.split("|")
-                path = parts[0]
-            except:
-                return
+            path = unquote(path)
+        return safe_path(path)
 
-            # 尝试提取索引并更新计数
-            if len(parts) >= 3:
-                try:
-                    current_idx = int(parts[1])
-                    if self.image_count > 0:
-                        # 确保索引显示安全
-                        display_idx = max(0, min(current_idx + 1, self.image_count))
-                        t = TRANSLATIONS[self.lang]
-                        self.count_label.setText(
-                            t["image_count"].format(display_idx, self.image_count)
-                        )
-                except Exception:
-                    pass
+    def _on_web_image_clicked(self, path, index):
+        """页面点击或切换图片：更新状态栏的序号和文件大小"""
+        try:
+            if self.image_count > 0:
+                # 确保索引显示安全
+                display_idx = max(0, min(index + 1, self.image_count))
+                t = TRANSLATIONS[self.lang]
+                self.count_label.setText(
+                    t["image_count"].format(display_idx, self.image_count)
+                )
 
-            # 清理路径 (可能包含 URL 编码或前缀)
-            if path.startswith("file:///"):
-                path = path[8:]
+            target_path = self._from_web_path(path)
+            if os.path.isfile(target_path):
+                size_mb = os.path.getsize(target_path) / (1024 * 1024)
+                self.size_label.setText(f"{size_mb:.2f} MB")
+            else:
+                self.size_label.setText("")
+        except Exception as e:
+            print(f"Error handling image click: {e}")
+            self.size_label.setText("")
 
-            # Windows 路径处理
-            if sys.platform == "win32":
-                path = path.replace("/", "\\")
+    def _on_web_exif_requested(self, path):
+        """页面请求 EXIF 信息"""
+        try:
+            full_path = self._from_web_path(path)
+            if os.path.exists(full_path):
+                self._send_exif_info(full_path)
+        except Exception as e:
+            print(f"Error handling EXIF request: {e}")
 
-            # 获取文件大小
-            try:
-                target_path = path
-                # 1. 直接检查
-                if not os.path.exists(target_path):
-                    # 2. URL 解码后检查
-                    from urllib.parse import unquote
-
-                    target_path = unquote(path)
-
-                # 3. 安全路径处理 (长路径)
-                if not os.path.exists(target_path):
-                    target_path = safe_path(target_path)
-
-                # 最终检查
-                if os.path.exists(target_path) and os.path.isfile(target_path):
-                    size_bytes = os.path.getsize(target_path)
-                    size_mb = size_bytes / (1024 * 1024)
-                    self.size_label.setText(f"{size_mb:.2f} MB")
-                else:
-                    self.size_label.setText("")
-            except Exception:
-                self.size_label.setText("")
+    def _request_web_stats(self):
+        """空闲时请页面回报缩略图加载统计"""
+        if self.is_scanning or not getattr(self, "web_view", None) or not self.web_view.bridge:
+            return
+        self.web_view.bridge.post("stats_requested")
 
-        except BaseException as e:
-            # 捕获所有异常，防止崩溃
-            try:
-                print(f"CRITICAL: Error in _on_web_title_changed: {e}")
-                traceback.print_exc()
-            except:
-                pass
+    def _on_web_stats_reported(self, stats):
+        """打印页面的缩略图加载统计（渲染数、成功、失败、重试）"""
+        total = int(stats.get("total") or 0)
+        if not total:
+            return
+        print(
+            f"Waterfall stats ({stats.get('mode')}): {int(stats.get('renderedItems') or 0)}/{total} rendered, "
+            f"{int(stats.get('loaded') or 0)} loaded, {int(stats.get('error') or 0)} errors, "
+            f"{int(stats.get('retries') or 0)} retries"
+        )
 
     def resizeEvent(self, event):
         """主窗口大小变化"""
@@ -5696,6 +8201,21 @@ class ImageViewerWindow(QMainWindow):
 
         super().resizeEvent(event)
 
+    def closeEvent(self, event):
+        """关闭主窗口：停止扫描和文件夹监视，提交排队中的缓存写入"""
+        try:
+            if self.current_worker:
+                self.current_worker.abort()
+                self.current_worker = None
+            self._gc_timer.stop()
+            if self._gc_task:
+                self._gc_task.abort()
+            self._clear_watched_directories()
+            g_metadata_cache.flush(timeout=10)
+        except Exception as e:
+            print(f"Error while closing: {e}")
+        super().closeEvent(event)
+
     def _resume_web_updates(self):
         """恢复 Web 更新"""
         if hasattr(self, "web_view"):
@@ -5960,6 +8480,9 @@ class ImageViewerWindow(QMainWindow):
         self._load_favorites_from_settings(check_exists=True)
         self._update_favorites_tree_ui(check_subdirs=True)
 
+        # 3. 后台清理超出上限的缩略图缓存
+        threading.Thread(target=g_thumbnail_cache.prune, daemon=True).start()
+
     def _load_history_from_settings(self, check_exists=True):
         """从配置加载历史目录"""
         try:
@@ -6547,35 +9070,36 @@ class ImageViewerWindow(QMainWindow):
                 # 获取新尺寸
                 new_w, new_h = img.size
 
-            # 更新内部数据缓存 (current_img_data 和 original_img_data)
-            full_path = safe_path(path)
-
-            # 更新 current_img_data
-            for item in self.current_img_data:
-                if self._paths_are_equal(item["path"], full_path):
-                    item["w"] = new_w
-                    item["h"] = new_h
-                    break
-
-            # 更新 original_img_data
-            if hasattr(self, "original_img_data"):
-                for item in self.original_img_data:
-                    if self._paths_are_equal(item["path"], full_path):
-                        item["w"] = new_w
-                        item["h"] = new_h
-                        break
+            # 原地改写不会改变目录修改时间，需要手动让目录快照失效
+            g_metadata_cache.invalidate_directory_snapshot(os.path.dirname(path))
+
+            # 文件大小和修改时间已变化，重新登记以便缩略图协议生成新缩略图
+            st = os.stat(path)
+            handler = getattr(self.web_view, "thumb_handler", None)
+            if handler is not None:
+                handler.register(path, st.st_size, st.st_mtime, new_w, new_h)
+
+            # 更新内部数据缓存（current_img_data 和 original_img_data 共用同一个 ImageStore）
+            store = self.original_img_data.store
+            row = store.find(safe_path(path))
+            position = -1
+            if row is not None:
+                item = store.record(row)
+                item.update(w=new_w, h=new_h, size=st.st_size, mtime=st.st_mtime)
+                item.pop("embedded", None)  # 重新保存后内嵌缩略图位置已失效
+                # 页面按位置定位，记录未拉取的图片也能更新
+                indices = self.current_img_data.indices
+                if row in indices:
+                    position = indices.index(row)
 
             # 刷新显示（不重新扫描，直接通知前端更新）
             path_str = path.replace("\\", "/")
-            timestamp = int(time.time())
+            version = self._web_version(st.st_size, st.st_mtime)
 
-            # 使用 json.dumps 确保字符串安全
-            path_json = json.dumps(path_str)
-
-            if hasattr(self, "web_view") and self.web_view.page():
-                # 注意：path_json 已经包含了引号，所以 JS 中不需要再加引号
-                js_code = f"if (typeof imageRotated === 'function') {{ imageRotated({path_json}, {new_w}, {new_h}, {timestamp}); }}"
-                self.web_view.page().runJavaScript(js_code)
+            if getattr(self, "web_view", None) and self.web_view.bridge:
+                self.web_view.bridge.post(
+                    "image_rotated", path_str, new_w, new_h, version, position
+                )
 
         except Exception as e:
             print(f"Rotate error: {e}")
@@ -6614,8 +9138,11 @@ class ImageViewerWindow(QMainWindow):
         # Deprecated: Kept for compatibility if button still exists, but logic moved to _on_scan_mode_changed
         pass
 
-    def _scan_images(self, dir_path):
-        """扫描目录下的图片（兼容中文/特殊符号路径）"""
+    def _scan_images(self, dir_path, use_snapshot=True):
+        """扫描目录下的图片（兼容中文/特殊符号路径）
+
+        use_snapshot 为 False 时忽略目录快照，重新列出所有文件（手动刷新）
+        """
 
         # Abort existing scan if any
         if self.current_worker:
@@ -6626,7 +9153,9 @@ class ImageViewerWindow(QMainWindow):
         current_scan_id = self.scan_id
 
         self.is_scanning = True
+        self.is_library_search = False
         self.current_dir = dir_path
+        self._clear_watched_directories()
 
         # 使用全局扫描模式
         is_recursive = self.is_recursive_mode
@@ -6640,20 +9169,62 @@ class ImageViewerWindow(QMainWindow):
         self.status_bar.repaint()
 
         # 使用线程池扫描
-        worker = ScanWorker(dir_path, current_scan_id, recursive=is_recursive)
+        self._start_scan_worker(
+            ScanWorker(
+                dir_path,
+                current_scan_id,
+                recursive=is_recursive,
+                use_snapshot=use_snapshot,
+            )
+        )
+
+    def _search_library(self, text):
+        """在所有扫描过的文件夹中搜索（只查询元数据缓存，不访问磁盘）"""
+        text = text.strip()
+        if not text:
+            return
+
+        if self.current_worker:
+            self.current_worker.abort()
+            self.current_worker = None
+
+        self.scan_id += 1
+        self.is_scanning = True
+        self.is_library_search = True
+        # 图库结果不再按当前文件夹的关键字筛选
+        self.current_search_text = ""
+        self._clear_watched_directories()
+
+        t = TRANSLATIONS[self.lang]
+        self.progress_label.setText(t["library_searching"].format(text))
+        self.status_bar.repaint()
+
+        self._start_scan_worker(LibrarySearchWorker(text, self.scan_id))
+
+    def _start_scan_worker(self, worker):
+        """启动扫描或图库搜索任务，分批结果流式显示在瀑布流中"""
         self.current_worker = worker
 
         # 连接信号
         worker.signals.batch_ready.connect(self._on_batch_ready)
         worker.signals.finished.connect(self._on_scan_finished)
 
+        # 扫描期间暂停缓存回收
+        self._gc_timer.stop()
+        if self._gc_task:
+            self._gc_task.abort()
+
+        # 分批到达的图片直接追加到本次扫描的存储上
+        self.current_img_data = ImageView(worker.store)
+
         # 启动前先清空 WebEngine 视图
-        if self.is_web_loaded:
-            # 初始化数据为空
-            self.current_img_data = []
-            self.web_view.page().runJavaScript(
-                "if (typeof clearImages === 'function') { clearImages(); }"
-            )
+        # 与随后的分批数据走同一通道，保证先清空再追加（页面未就绪时一并排队）
+        web_view = getattr(self, "web_view", None)
+        if web_view and web_view.bridge:
+            web_view.bridge.post("images_cleared")
+        # 缩略图登记随页面一起清空，切换文件夹时不再累积
+        if web_view and web_view.thumb_handler:
+            web_view.thumb_handler.reset()
 
         self.thread_pool.start(worker)
 
@@ -6662,49 +9233,23 @@ class ImageViewerWindow(QMainWindow):
         if scan_id != self.scan_id:
             return
 
-        if not self.is_web_loaded:
-            return
-
-        # 过滤有效数据
-        safe_data = []
-        timestamp = int(time.time())
+        # 追加到当前视图（只记录行号，排序等功能照常工作）
+        view = self.current_img_data
+        old_count = len(view)
         for item in batch_data:
-            if isinstance(item, dict) and "path" in item:
-                # 处理路径
-                raw_path = item["path"]
-                if sys.platform == "win32" and raw_path.startswith("\\\\?\\"):
-                    raw_path = raw_path[4:]
-                clean_path = unicodedata.normalize("NFC", raw_path.replace("\\", "/"))
-
-                # 构建前端对象
-                safe_item = {
-                    "path": clean_path,
-                    "src": clean_path + f"?v={timestamp}",
-                    "w": item["w"],
-                    "h": item["h"],
-                }
-                safe_data.append(safe_item)
-
-                # 同时更新内部数据（使用原始item以便排序等功能正常工作）
-                self.current_img_data.append(item)
-
-        if not safe_data:
+            if isinstance(item, ImageRecord) and item.store is view.store:
+                view.append(item)
+        added = view[old_count:]
+        if not added:
             return
 
-        json_str = json.dumps(safe_data)
-        # 调用前端的 appendImages
-        self.web_view.page().runJavaScript(
-            f"if (typeof appendImages === 'function') {{ appendImages({json_str}); }}"
-        )
+        # 页面只收到新图片的宽高比用于占位排版，记录在滚动到附近时按页拉取
+        # （页面尚未加载完成时由通信桥排队）
+        if getattr(self, "web_view", None) and self.web_view.bridge:
+            self.web_view.bridge.post("images_extended", added.aspect_ratios())
 
         # 更新状态栏计数
-        count = len(self.current_img_data)
-        self.image_count = count
-        t = TRANSLATIONS[self.lang]
-        if count > 0:
-            self.count_label.setText(t["image_count"].format(1, count))
-        else:
-            self.count_label.setText(t["image_count"].format(0, 0))
+        self._update_count_labels()
 
     def _on_scan_finished(self, img_data, scan_id):
         if scan_id != self.scan_id:
@@ -6717,6 +9262,9 @@ class ImageViewerWindow(QMainWindow):
         # 1. 保存原始数据
         self.original_img_data = img_data
         self.current_img_data = img_data
+        if not self.is_library_search:
+            self._update_watched_directories(img_data)
+        self._gc_timer.start()
 
         t = TRANSLATIONS[self.lang]
         self.progress_label.setText(t["loading_count"].format(len(img_data)))
@@ -6735,53 +9283,52 @@ class ImageViewerWindow(QMainWindow):
             # 如果有筛选，直接调用筛选逻辑，它会更新视图
             self._on_search_filter_changed()
         else:
-            # 只有在数据为空，或者排序模式不是默认时，才需要全量刷新
-            # 如果是默认排序，流式加载已经显示了正确顺序的图片
-            should_full_refresh = False
-
-            if not img_data:
-                should_full_refresh = True
-            elif (
-                self.current_sort_mode != "name"
-                and self.current_sort_mode != "name_asc"
-            ):
-                # 非默认排序，需要重新排序并刷新
-                should_full_refresh = True
-
-            if should_full_refresh:
-                try:
-                    self._apply_sort()
-                    self._update_web_view_images()  # 这是一个全量刷新
-                except Exception as e:
-                    traceback.print_exc()
-            else:
-                # 更新一下计数和状态即可
-                count = len(self.current_img_data)
-                self.image_count = count
-                t = TRANSLATIONS[self.lang]
-                self.progress_label.setText(t["scan_done"].format(count))
-                if count > 0:
-                    self.count_label.setText(t["image_count"].format(1, count))
+            # 流式加载的顺序是目录列出的顺序（scandir 不排序，递归扫描还取决于目录完成先后，
+            # 图库搜索按索引顺序返回），结束时都按当前排序方式重新排序；
+            # 之后文件夹监视的插入位置（_insertion_index）也依赖视图已排好序
+            try:
+                streamed = self.current_img_data.indices
+                self._apply_sort()
+                if not img_data:
+                    self._update_web_view_images()
+                elif self.current_img_data.indices != streamed:
+                    # 扫描期间用户可能已经往下滚动，重新排序后保持滚动位置
+                    self._update_web_view_images(keep_scroll=True)
+                else:
+                    # 顺序没变，更新一下计数和状态即可
+                    self.progress_label.setText(t["scan_done"].format(len(img_data)))
+                    self._update_count_labels()
+            except Exception as e:
+                traceback.print_exc()
 
-        # 尝试添加到历史记录
-        if img_data and len(img_data) > 0:
+        # 尝试添加到历史记录（图库搜索结果不属于某个文件夹，不记录）
+        if img_data and len(img_data) > 0 and not self.is_library_search:
             # 取第一张图所在的目录作为记录路径
             first_path = img_data[0]["path"]
+            if self.is_recursive_mode:
+                # 并行扫描时第一张图不一定来自最上层目录，取层级最浅的一张
+                first_path = min(
+                    (item["path"] for item in img_data), key=lambda p: p.count(os.sep)
+                )
             dir_path = os.path.dirname(first_path)
             self._add_to_history(dir_path)
 
-    def _paths_are_equal(self, p1, p2):
-        """比较两个路径是否相同（忽略大小写和格式差异）"""
-        try:
-            if not p1 or not p2:
-                return False
-            n1 = safe_path(p1)
-            n2 = safe_path(p2)
-            if sys.platform == "win32":
-                return n1.lower() == n2.lower()
-            return n1 == n2
-        except:
-            return False
+    def _forget_image(self, path):
+        """从 original_img_data 和 current_img_data 中移除图片（按路径索引定位，不逐项比较路径）
+
+        并通知前端只移除这一张，不重发整个列表
+        """
+        row = self.original_img_data.store.find(path)
+        if row is None:
+            return
+        indices = self.current_img_data.indices
+        position = indices.index(row) if row in indices else None
+        self.current_img_data = self.current_img_data.without({row})
+        self.original_img_data = self.original_img_data.without({row})
+
+        if position is not None and getattr(self, "web_view", None) and self.web_view.bridge:
+            self.web_view.bridge.post("images_removed", [position])
+        self._update_count_labels()
 
     def _copy_image(self, path):
         """复制图片到..."""
@@ -6867,22 +9414,7 @@ class ImageViewerWindow(QMainWindow):
             shutil.move(path, dest_path)
 
             # 更新显示
-            full_path = safe_path(path)
-            self.current_img_data = [
-                img
-                for img in self.current_img_data
-                if not self._paths_are_equal(img["path"], full_path)
-            ]
-
-            # 同时更新原始数据
-            if hasattr(self, "original_img_data"):
-                self.original_img_data = [
-                    img
-                    for img in self.original_img_data
-                    if not self._paths_are_equal(img["path"], full_path)
-                ]
-
-            self._update_web_view_images()
+            self._forget_image(safe_path(path))
 
             QMessageBox.information(self, t["success"], t["move_success"])
         except Exception as e:
@@ -6921,43 +9453,12 @@ class ImageViewerWindow(QMainWindow):
                 if os.path.exists(full_path):
                     send2trash.send2trash(full_path)
 
-                    # 从当前数据中移除
-                    # 使用宽松匹配
-                    original_count = len(self.current_img_data)
-                    self.current_img_data = [
-                        img
-                        for img in self.current_img_data
-                        if not self._paths_are_equal(img["path"], full_path)
-                    ]
-
-                    # 同时从原始数据中移除
-                    if hasattr(self, "original_img_data"):
-                        self.original_img_data = [
-                            img
-                            for img in self.original_img_data
-                            if not self._paths_are_equal(img["path"], full_path)
-                        ]
-
-                    new_count = len(self.current_img_data)
-
-                    # 刷新显示
-                    self._update_web_view_images()
+                    # 从当前数据和原始数据中移除，并同步到前端
+                    self._forget_image(full_path)
                 else:
                     QMessageBox.warning(self, t["error"], t["file_not_exist"])
                     # 即使文件不存在，也尝试从列表中移除
-                    self.current_img_data = [
-                        img
-                        for img in self.current_img_data
-                        if not self._paths_are_equal(img["path"], full_path)
-                    ]
-                    # 同时从原始数据中移除
-                    if hasattr(self, "original_img_data"):
-                        self.original_img_data = [
-                            img
-                            for img in self.original_img_data
-                            if not self._paths_are_equal(img["path"], full_path)
-                        ]
-                    self._update_web_view_images()
+                    self._forget_image(full_path)
 
             except Exception as e:
                 QMessageBox.critical(self, t["error"], t["delete_fail"].format(e))
@@ -6965,9 +9466,239 @@ class ImageViewerWindow(QMainWindow):
     def _refresh_images(self):
         """刷新当前目录"""
         if self.current_dir:
-            # 强制清空当前数据，确保重新加载
-            self.current_img_data = []
-            self._scan_images(self.current_dir)
+            # 不使用目录快照，强制重新列出所有文件
+            self._scan_images(self.current_dir, use_snapshot=False)
+
+    # ===================== 文件夹监视（增量刷新） =====================
+    @staticmethod
+    def _watch_key(path):
+        return os.path.normcase(ThumbnailCache._clean_path(path))
+
+    def _clear_watched_directories(self):
+        watched = self.fs_watcher.directories()
+        if watched:
+            self.fs_watcher.removePaths(watched)
+        self._changed_dirs.clear()
+        self._watch_scans.clear()
+        self._watch_timer.stop()
+        self._watch_overflow = False
+
+    def _update_watched_directories(self, img_data):
+        """扫描完成后监视当前目录（递归模式下还包括所有含图片的子目录）"""
+        self._clear_watched_directories()
+        if not self.current_dir:
+            return
+        root = ThumbnailCache._clean_path(self.current_dir)
+        dirs = {root}
+        if self.is_recursive_mode:
+            dirs.update(
+                os.path.dirname(ThumbnailCache._clean_path(item["path"]))
+                for item in img_data
+            )
+        if len(dirs) > WATCH_MAX_DIRS:
+            self._watch_overflow = True
+            dirs = {root}
+        if self.fs_watcher.addPaths(sorted(dirs)):
+            # 超出系统监视数量上限（如 inotify max_user_watches），只保留根目录
+            self._watch_overflow = True
+            self.fs_watcher.removePaths(self.fs_watcher.directories())
+            self.fs_watcher.addPath(root)
+
+    def _watch_new_directories(self, items):
+        """增量中出现的新子目录也加入监视"""
+        if self._watch_overflow or not self.is_recursive_mode:
+            return
+        watched = set(self.fs_watcher.directories())
+        dirs = {
+            os.path.dirname(ThumbnailCache._clean_path(item["path"])) for item in items
+        } - watched
+        if not dirs:
+            return
+        if len(watched) + len(dirs) > WATCH_MAX_DIRS or self.fs_watcher.addPaths(
+            sorted(dirs)
+        ):
+            self._watch_overflow = True
+
+    def _on_watched_directory_changed(self, path):
+        if self.is_scanning:
+            return
+        self._changed_dirs.add(path)
+        # 目录被删除重建后会自动移出监视列表，重新加入
+        if os.path.isdir(path) and path not in self.fs_watcher.directories():
+            self.fs_watcher.addPath(path)
+        self._watch_timer.start()
+
+    def _process_directory_changes(self):
+        """防抖后对变化的目录做增量扫描，溢出时整体重新扫描"""
+        dirs, self._changed_dirs = self._changed_dirs, set()
+        if not dirs or not self.current_dir or self.is_scanning:
+            return
+
+        if self._watch_overflow or len(dirs) > WATCH_MAX_PENDING_DIRS:
+            self._scan_images(self.current_dir, use_snapshot=False)
+            return
+
+        if self.is_recursive_mode:
+            # 递归模式下上层目录的扫描已经覆盖子目录
+            keys = {self._watch_key(d): d for d in dirs}
+            dirs = [
+                d
+                for k, d in keys.items()
+                if not any(k.startswith(other.rstrip(os.sep) + os.sep) for other in keys)
+            ]
+
+        for dir_path in dirs:
+            # 原地修改文件不会改变目录修改时间，快照必须失效
+            g_metadata_cache.invalidate_directory_snapshot(dir_path)
+            token = self._next_watch_scan
+            self._next_watch_scan += 1
+            self._watch_scans[token] = (dir_path, self.scan_id)
+            worker = ScanWorker(
+                safe_path(dir_path), token, recursive=self.is_recursive_mode
+            )
+            worker.signals.finished.connect(self._on_watch_scan_finished)
+            self.thread_pool.start(worker)
+
+    def _on_watch_scan_finished(self, img_data, token):
+        entry = self._watch_scans.pop(token, None)
+        if entry is None:
+            return
+        dir_path, scan_id = entry
+        # 期间切换了目录或开始了新的完整扫描
+        if scan_id != self.scan_id or self.is_scanning:
+            return
+        try:
+            self._apply_directory_delta(dir_path, img_data)
+        except Exception:
+            traceback.print_exc()
+
+    def _apply_directory_delta(self, dir_path, new_items):
+        """对比目录的新旧图片列表，只向前端发送新增 / 删除 / 修改的图片
+
+        新列表中的图片按路径索引（ImageStore.find）找到旧行，旧列表只按目录序号圈定范围，
+        不再为整个列表计算路径键。
+        """
+        store = self.original_img_data.store
+        scope_dirs = store.dir_ids_under(dir_path, self.is_recursive_mode)
+        dir_ids = store.dir_ids
+        old_rows = (
+            {row for row in self.original_img_data.indices if dir_ids[row] in scope_dirs}
+            if scope_dirs
+            else set()
+        )
+
+        added = []
+        updated = []
+        kept_rows = set()
+        for item in new_items:
+            row = store.find(item["path"])
+            if row is None or row not in old_rows:
+                added.append(item)
+                continue
+            kept_rows.add(row)
+            o = store.record(row)
+            if o["size"] != item["size"] or abs((o["mtime"] or 0) - item["mtime"]) >= 0.01:
+                updated.append((o, item))
+        removed_rows = old_rows - kept_rows
+        added.sort(key=lambda x: x["path"].lower())
+        if not (removed_rows or added or updated):
+            return
+
+        visible_rows = set(self.current_img_data.indices)
+        sort_order = self._sort_order()
+        moved = []  # 按日期或大小排序时修改过的图片要换位置：先删除再按新值插入
+        update_items = []
+        for o, n in updated:
+            o.update(w=n["w"], h=n["h"], size=n["size"], mtime=n["mtime"])
+            o.pop("embedded", None)
+            if n.get("embedded"):
+                o["embedded"] = n["embedded"]
+            if o.index not in visible_rows:
+                continue
+            if sort_order and sort_order[0] != "name":
+                moved.append(o)
+                continue
+            safe_item = {"path": self._to_web_path(o["path"]), "w": o["w"], "h": o["h"]}
+            self._register_web_image(safe_item, o)
+            safe_item["v"] = self._web_version(o["size"], o["mtime"])
+            update_items.append((safe_item, o.index))
+
+        # 扫描完成时 original_img_data 和 current_img_data 可能是同一个视图，这里重建为两个
+        dropped_rows = removed_rows | {o.index for o in moved}
+        # 移出当前视图的图片的位置（页面按位置删除，未拉取记录的图片也能对上）
+        visible_removed = [
+            position
+            for position, row in enumerate(self.current_img_data.indices)
+            if row in dropped_rows
+        ]
+        # 新图片来自增量扫描自己的存储，追加到当前存储中
+        added = [store.record(store.append_item(item)) for item in added]
+        self.original_img_data = self.original_img_data.without(removed_rows)
+        self.original_img_data.extend(added)
+        self.current_img_data = self.current_img_data.without(dropped_rows)
+        if update_items:
+            # 页面先删除、再更新、最后插入，更新的位置按删除后的视图计算
+            positions = {row: p for p, row in enumerate(self.current_img_data.indices)}
+            for safe_item, row in update_items:
+                safe_item["index"] = positions[row]
+
+        insert_items = []
+        for item in moved + added:
+            if not self._matches_filters(item):
+                continue
+            index = self._insertion_index(item)
+            self.current_img_data.insert(index, item)
+            insert_items.append(self._web_item(item, index=index))
+
+        self._watch_new_directories(added)
+
+        if self.is_web_loaded and self.web_view.bridge:
+            bridge = self.web_view.bridge
+            if visible_removed:
+                bridge.post("images_removed", visible_removed)
+            for safe_item, _ in update_items:
+                bridge.post("image_updated", safe_item)
+            if insert_items:
+                bridge.post("images_inserted", insert_items)
+
+        count = len(self.current_img_data)
+        self.image_count = count
+        t = TRANSLATIONS[self.lang]
+        self.progress_label.setText(t["scan_done"].format(count))
+        self.count_label.setText(t["image_count"].format(1 if count else 0, count))
+
+    def _start_cache_gc(self):
+        """空闲时回收元数据缓存，两次回收至少间隔 METADATA_GC_INTERVAL_HOURS"""
+        if self.is_scanning or self._gc_task:
+            return
+        last_gc = self.settings.value("cache_gc_time", 0.0, type=float)
+        if time.time() - last_gc < METADATA_GC_INTERVAL_HOURS * 3600:
+            return
+        task = CacheGCTask()
+        task.signals.finished.connect(self._on_cache_gc_finished)
+        self._gc_task = task
+        self.thread_pool.start(task)
+
+    def _on_cache_gc_finished(self, report):
+        self._gc_task = None
+        if report is None:
+            # 被扫描中止，下次空闲时重试
+            return
+        self.settings.setValue("cache_gc_time", time.time())
+        removed = report["missing"] + report["evicted"]
+        mb = 1024 * 1024
+        print(
+            f"Metadata cache GC: {report['missing']} missing, {report['evicted']} evicted, "
+            f"{report['bytes_before'] / mb:.1f} MB -> {report['bytes_after'] / mb:.1f} MB"
+        )
+        if removed:
+            t = TRANSLATIONS[self.lang]
+            self.status_bar.showMessage(
+                t["cache_gc_done"].format(
+                    removed, report["bytes_before"] / mb, report["bytes_after"] / mb
+                ),
+                5000,
+            )
 
     def _change_sort_order(self, mode):
         """更改排序方式"""
@@ -7009,70 +9740,128 @@ class ImageViewerWindow(QMainWindow):
             return
 
         try:
-            if self.current_sort_mode == "name" or self.current_sort_mode == "name_asc":
-                self.current_img_data.sort(key=lambda x: x["path"].lower())
-            elif self.current_sort_mode == "name_desc":
-                self.current_img_data.sort(
-                    key=lambda x: x["path"].lower(), reverse=True
-                )
-            elif self.current_sort_mode == "date_asc":
-                self.current_img_data.sort(key=lambda x: x.get("mtime", 0))
-            elif self.current_sort_mode == "date_desc":
-                self.current_img_data.sort(
-                    key=lambda x: x.get("mtime", 0), reverse=True
-                )
-            elif self.current_sort_mode == "size_desc":
-                self.current_img_data.sort(key=lambda x: x.get("size", 0), reverse=True)
-            elif self.current_sort_mode == "size_asc":
-                self.current_img_data.sort(key=lambda x: x.get("size", 0))
+            sort_order = self._sort_order()
+            if sort_order:
+                self.current_img_data.sort_by(*sort_order)
         except Exception:
             pass
 
-    def _update_web_view_images(self):
-        """更新 Web 视图图片列表"""
-        try:
-            timestamp = int(time.time())
-            safe_data = []
-            for item in self.current_img_data:
-                # 移除 Windows 长路径前缀 \\?\ 以便前端匹配
-                raw_path = item["path"]
-                if sys.platform == "win32" and raw_path.startswith("\\\\?\\"):
-                    raw_path = raw_path[4:]
-
-                # 规范化路径 (NFC) 并替换反斜杠
-                clean_path = unicodedata.normalize("NFC", raw_path.replace("\\", "/"))
-                safe_data.append(
-                    {
-                        "path": clean_path,  # 原始路径（用于ID）
-                        "src": clean_path + f"?v={timestamp}",  # 显示路径（带时间戳）
-                        "w": item["w"],
-                        "h": item["h"],
-                    }
-                )
+    def _sort_order(self):
+        """当前排序方式对应的 (排序字段, 是否倒序)，未知方式返回 None"""
+        mode = self.current_sort_mode
+        if mode in ("name", "name_asc", "name_desc"):
+            return "name", mode == "name_desc"
+        if mode in ("date_asc", "date_desc"):
+            return "mtime", mode == "date_desc"
+        if mode in ("size_asc", "size_desc"):
+            return "size", mode == "size_desc"
+        return None
 
-            json_str = json.dumps(safe_data)
+    def _insertion_index(self, item):
+        """按当前排序方式，新图片插入 current_img_data 的位置
 
-            # 调用 JS 更新图片
-            if hasattr(self, "web_view") and self.web_view.page():
-                self.web_view.page().runJavaScript(
-                    f"if (typeof updateImages === 'function') {{ updateImages({json_str}); }}"
-                )
+        当前视图已排好序（扫描结束时排序），二分查找只为 O(log n) 张图片计算排序键。
+        键相同时与 ImageStore.order 一致：新行在升序中排在后面，倒序中排在前面。
+        """
+        sort_order = self._sort_order()
+        indices = self.current_img_data.indices
+        if not sort_order:
+            return len(indices)
+        field, reverse = sort_order
+        store = self.current_img_data.store
+        key = store.sort_key(field, item.index)
+        lo, hi = 0, len(indices)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other_key = store.sort_key(field, indices[mid])
+            if (other_key > key) if reverse else not (key < other_key):
+                lo = mid + 1
             else:
-                pass
+                hi = mid
+        return lo
+
+    def _update_web_view_images(self, keep_scroll=False):
+        """把当前视图同步到 Web 端（排序、筛选后调用）
+
+        只发送按新顺序排列的宽高比，页面据此排版并按页拉取可见范围的记录，
+        已有的节点按图片 id 复用。keep_scroll 为 False 时页面回到顶部。
+        """
+        try:
+            if getattr(self, "web_view", None) and self.web_view.bridge:
+                self.web_view.bridge.post(
+                    "images_ordered", self.current_img_data.aspect_ratios(), keep_scroll
+                )
 
             count = len(self.current_img_data)
-            self.image_count = count
             t = TRANSLATIONS[self.lang]
             self.progress_label.setText(t["scan_done"].format(count))
-            if count > 0:
-                self.count_label.setText(t["image_count"].format(1, count))
-            else:
-                self.count_label.setText(t["image_count"].format(0, 0))
+            self._update_count_labels()
         except Exception as e:
             traceback.print_exc()
 
+    def _on_web_images_requested(self, generation, start, count):
+        """页面按页拉取图片记录；generation 原样带回，页面据此丢弃过期的回复"""
+        try:
+            view = self.current_img_data
+            start = max(0, start)
+            rows = view.indices[start : start + min(count, WEB_PAGE_MAX)]
+            records = [self._web_item(view.store.record(row)) for row in rows]
+            self.web_view.bridge.post("images_page", generation, start, records)
+        except Exception as e:
+            print(f"Error serving web image page: {e}")
+
+    def _update_count_labels(self):
+        """刷新状态栏的图片计数"""
+        count = len(self.current_img_data)
+        self.image_count = count
+        t = TRANSLATIONS[self.lang]
+        self.count_label.setText(t["image_count"].format(1 if count else 0, count))
+
     # _on_scan_finished moved up for streaming support
 
+    def _to_web_path(self, path):
+        """转换为前端使用的路径：去掉 \\?\ 前缀、规范化 (NFC) 并替换反斜杠"""
+        if sys.platform == "win32" and path.startswith("\\\\?\\"):
+            path = path[4:]
+        return unicodedata.normalize("NFC", path.replace("\\", "/"))
+
+    @staticmethod
+    def _web_version(size, mtime):
+        """图片 URL 的版本号：由文件大小和修改时间决定
+
+        排序、筛选、删除后 URL 保持不变，Chromium 可直接复用已解码的图片；
+        只有内容被改写（旋转、外部修改）的图片才会换新地址。
+        """
+        return f"{int(size or 0):x}-{int((mtime or 0) * 1000):x}"
+
+    def _web_item(self, item, **extra):
+        """构建发给前端的图片记录"""
+        clean_path = self._to_web_path(item["path"])
+        safe_item = {
+            "path": clean_path,  # 原始路径（用于ID）
+            # 显示路径（带内容版本号，文件不变则 URL 不变）
+            "src": f"{clean_path}?v={self._web_version(item['size'], item['mtime'])}",
+            "w": item["w"],
+            "h": item["h"],
+            **extra,
+        }
+        self._register_web_image(safe_item, item)
+        return safe_item
+
+    def _register_web_image(self, safe_item, item):
+        """登记图片并附加 id，前端据此请求 picsee-thumb://<id>?w=<列宽> 缩略图"""
+        handler = getattr(self.web_view, "thumb_handler", None) if self.web_view else None
+        if handler is None:
+            return
+        safe_item["id"] = handler.register(
+            item["path"],
+            item.get("size"),
+            item.get("mtime"),
+            item.get("w") or 0,
+            item.get("h") or 0,
+            item.get("embedded"),
+        )
+
     def _on_scroll(self, value):
         pass
 
@@ -7751,6 +10540,9 @@ class ImageViewerWindow(QMainWindow):
 
 # ========== 主程序入口（修复无控制台环境崩溃） ==========
 if __name__ == "__main__":
+    # 打包后的程序需要支持多进程解码的子进程启动（必须最先执行）
+    multiprocessing.freeze_support()
+
     # log_file = open("picsee_debug.log", "w", encoding="utf-8", buffering=1)
     # Additional crash diagnostics for headless environments
     try:
@@ -7816,7 +10608,14 @@ if __name__ == "__main__":
     # except Exception:
     #     pass
 
+    init_global_caches()
+
+    # 自定义缩略图协议必须在创建 QApplication 之前注册
+    register_thumbnail_scheme()
+
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(g_decode_service.shutdown)
+    app.aboutToQuit.connect(g_metadata_cache.close)
     try:
         from PyQt5.QtGui import QFontDatabase, QFont
 
@@ -0,0 +1,107 @@
+"""
+对比 JPEG 降采样解码（Image.draft）与完整解码的速度和画质
+
+用法：
+    python benchmarks/bench_decode.py [图片或目录 ...] [--width 400] [--repeat 3]
+
+不传路径时会生成一张 6000x4000 的测试 JPEG。画质以两种路径输出的
+缩略图之间的 PSNR 衡量（越高越接近完整解码的结果）。
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat  # noqa: E402
+
+from PicSee import open_image_scaled, process_enhanced_image  # noqa: E402
+
+
+def make_sample(path, size=(6000, 4000)):
+    img = Image.new("RGB", size)
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for x in range(0, w, 8):
+        draw.line([(x, 0), (w - x, h)], fill=(x % 256, (x * 3) % 256, 255 - x % 256))
+    for y in range(0, h, 40):
+        draw.rectangle([0, y, w, y + 6], fill=(255 - y % 256, y % 256, 128))
+    img.save(path, "JPEG", quality=92)
+
+
+def collect(paths):
+    exts = (".jpg", ".jpeg")
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                for f in files:
+                    if f.lower().endswith(exts):
+                        yield os.path.join(root, f)
+        elif p.lower().endswith(exts):
+            yield p
+
+
+def thumbnail(path, width, fast):
+    img, (orig_w, orig_h) = open_image_scaled(path, width, 1 << 30, fast=fast)
+    target_h = max(1, round(orig_h * width / orig_w))
+    return process_enhanced_image(img.convert("RGB"), width, target_h)
+
+
+def psnr(a, b):
+    diff = ImageChops.difference(a, b)
+    mse = sum(v * v for v in ImageStat.Stat(diff).rms) / 3
+    return float("inf") if mse == 0 else 20 * math.log10(255 / math.sqrt(mse))
+
+
+def bench(path, width, repeat):
+    timings = {}
+    results = {}
+    for fast in (False, True):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[fast] = thumbnail(path, width, fast)
+            best = min(best, time.perf_counter() - start)
+        timings[fast] = best
+    return timings[False], timings[True], psnr(results[False], results[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--width", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = list(collect(args.paths))
+    tmp_dir = None
+    if not paths:
+        tmp_dir = tempfile.TemporaryDirectory()
+        sample = os.path.join(tmp_dir.name, "sample.jpg")
+        make_sample(sample)
+        paths = [sample]
+
+    total_full = total_fast = 0.0
+    print(f"{'file':40} {'full(ms)':>10} {'draft(ms)':>10} {'speedup':>8} {'PSNR(dB)':>9}")
+    for path in paths:
+        full, fast, quality = bench(path, args.width, args.repeat)
+        total_full += full
+        total_fast += fast
+        print(
+            f"{os.path.basename(path)[:40]:40} {full * 1000:10.1f} {fast * 1000:10.1f} "
+            f"{full / fast:8.2f} {quality:9.2f}"
+        )
+    if len(paths) > 1:
+        print(f"{'TOTAL':40} {total_full * 1000:10.1f} {total_fast * 1000:10.1f} {total_full / total_fast:8.2f}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
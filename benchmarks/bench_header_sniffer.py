@@ -0,0 +1,136 @@
+"""
+对比纯 Python 文件头解析（sniff_image_header）与 Pillow 路径读取尺寸/方向的速度
+
+用法：
+    python benchmarks/bench_header_sniffer.py [--count 2000] [--repeat 3] [目录]
+
+不传目录时在临时目录生成 JPEG（含 EXIF 方向和内嵌缩略图）/ PNG / GIF /
+WebP / BMP / TIFF 混合语料。同时校验两条路径的结果一致。
+"""
+
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image  # noqa: E402
+
+from PicSee import ScanWorker, read_image_header_pillow, sniff_image_header  # noqa: E402
+
+
+def _exif_with_thumbnail(size, orientation):
+    """构造带方向标签和 IFD1 内嵌缩略图的 Exif 数据"""
+    thumb = io.BytesIO()
+    w, h = size
+    Image.new("RGB", (160, max(1, round(160 * h / w))), (90, 90, 90)).save(thumb, "JPEG")
+    thumb = thumb.getvalue()
+    ifd0_off = 8
+    ifd1_off = ifd0_off + 2 + 12 + 4
+    thumb_off = ifd1_off + 2 + 12 * 2 + 4
+    data = b"II*\x00" + struct.pack("<I", ifd0_off)
+    data += struct.pack("<H", 1) + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0)
+    data += struct.pack("<I", ifd1_off)
+    data += struct.pack("<H", 2)
+    data += struct.pack("<HHII", 0x0201, 4, 1, thumb_off)
+    data += struct.pack("<HHII", 0x0202, 4, 1, len(thumb))
+    data += struct.pack("<I", 0) + thumb
+    return b"Exif\x00\x00" + data
+
+
+def make_corpus(directory, count):
+    sizes = [(640, 480), (480, 640), (1024, 683), (300, 300)]
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        kind = i % 8
+        color = (i % 256, (i * 7) % 256, (i * 13) % 256)
+        base = os.path.join(directory, f"img_{i:05d}")
+        if kind in (0, 1, 2):
+            Image.new("RGB", size, color).save(
+                base + ".jpg", "JPEG", exif=_exif_with_thumbnail(size, (1, 6, 8)[kind])
+            )
+        elif kind == 3:
+            Image.new("RGBA", size, color + (128,)).save(base + ".png")
+        elif kind == 4:
+            Image.new("P", size).save(base + ".gif")
+        elif kind == 5:
+            Image.new("RGB", size, color).save(base + ".webp", lossless=i % 2 == 0)
+        elif kind == 6:
+            Image.new("RGB", size, color).save(base + ".bmp")
+        else:
+            Image.new("RGB", size, color).save(base + ".tiff")
+
+
+def collect(directory):
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(
+            os.path.join(root, n)
+            for n in names
+            if n.lower().endswith(ScanWorker.IMG_EXTENSIONS)
+        )
+    return sorted(files)
+
+
+def time_path(func, files, repeat):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(f) for f in files]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def pillow_or_none(path):
+    try:
+        return read_image_header_pillow(path)
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", nargs="?")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    directory = args.directory
+    if not directory:
+        tmp_dir = tempfile.TemporaryDirectory()
+        directory = tmp_dir.name
+        make_corpus(directory, args.count)
+
+    files = collect(directory)
+    pillow_time, pillow_results = time_path(pillow_or_none, files, args.repeat)
+    sniff_time, sniff_results = time_path(sniff_image_header, files, args.repeat)
+
+    fallback = sum(1 for r in sniff_results if r is None)
+    mismatches = [
+        (f, p, s)
+        for f, p, s in zip(files, pillow_results, sniff_results)
+        if s is not None and p != s
+    ]
+
+    print(f"files:      {len(files)}")
+    print(f"pillow:     {pillow_time * 1000:9.1f} ms  ({pillow_time / len(files) * 1e6:7.1f} us/file)")
+    print(f"sniffer:    {sniff_time * 1000:9.1f} ms  ({sniff_time / len(files) * 1e6:7.1f} us/file)")
+    print(f"speedup:    {pillow_time / sniff_time:9.2f}x")
+    print(f"fallback:   {fallback} file(s) need Pillow")
+    print(f"mismatches: {len(mismatches)}")
+    for f, p, s in mismatches[:10]:
+        print(f"  {os.path.basename(f)}: pillow={p} sniffer={s}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+对比 dict 列表与列式 ImageStore 保存扫描结果的内存占用和筛选/排序速度
+
+用法：
+    python benchmarks/bench_image_store.py [--count 500000] [--per-dir 500]
+
+模拟一次递归扫描的结果（每个目录 --per-dir 张图片，约三分之一带内嵌缩略图），
+分别用旧的 dict 列表和 ImageStore 保存，再各做一次筛选（保留一半）。
+内存以 tracemalloc 统计的 Python 堆增量衡量。
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PicSee import ImageStore  # noqa: E402
+
+
+def rows(count, per_dir):
+    root = os.path.join(os.sep, "photos", "library")
+    for i in range(count):
+        folder = os.path.join(root, f"{2000 + i // 100000}", f"album_{i // per_dir:05d}")
+        embedded = (2048 + i % 512, 8000 + i % 4000, 160, 120, 1) if i % 3 == 0 else None
+        yield (
+            os.path.join(folder, f"IMG_{i:07d}.JPG"),
+            6000 - i % 7,
+            4000 + i % 5,
+            5_000_000 + i,
+            1_600_000_000.0 + i * 1.5,
+            embedded,
+        )
+
+
+def build_dicts(count, per_dir):
+    data = []
+    for path, w, h, size, mtime, embedded in rows(count, per_dir):
+        item = {"path": path, "w": w, "h": h, "size": size, "mtime": mtime}
+        if embedded:
+            item["embedded"] = embedded
+        data.append(item)
+    return data
+
+
+def build_store(count, per_dir):
+    store = ImageStore()
+    for path, w, h, size, mtime, embedded in rows(count, per_dir):
+        store.append(path, w, h, size, mtime, embedded)
+    return store.view()
+
+
+def keep(item):
+    return item["size"] % 2 == 0
+
+
+def measure(build, filter_data, count, per_dir):
+    # 先计时（tracemalloc 会显著拖慢分配），再单独统计内存
+    start = time.perf_counter()
+    original = build(count, per_dir)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    current = filter_data(original)
+    filter_time = time.perf_counter() - start
+    start = time.perf_counter()
+    current.sort(key=lambda x: x["path"].lower())
+    sort_time = time.perf_counter() - start
+    del original, current
+
+    gc.collect()
+    tracemalloc.start()
+    original = build(count, per_dir)
+    current = filter_data(original)
+    gc.collect()
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 筛选结果计入堆内存，也顺带报告保留的数量
+    return heap, build_time, filter_time, sort_time, len(current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=500000)
+    parser.add_argument("--per-dir", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {
+        "dict list": measure(
+            build_dicts, lambda data: [i for i in data if keep(i)], args.count, args.per_dir
+        ),
+        "ImageStore": measure(
+            build_store, lambda view: view.filter(keep), args.count, args.per_dir
+        ),
+    }
+
+    mb = 1024 * 1024
+    print(f"images: {args.count}, per folder: {args.per_dir}")
+    print(
+        f"{'storage':12} {'heap(MB)':>10} {'B/image':>8} {'build(s)':>9} "
+        f"{'filter(s)':>10} {'sort(s)':>8} {'kept':>8}"
+    )
+    for name, (heap, build_time, filter_time, sort_time, kept) in results.items():
+        print(
+            f"{name:12} {heap / mb:10.1f} {heap / args.count:8.0f} {build_time:9.2f} "
+            f"{filter_time:10.2f} {sort_time:8.2f} {kept:8d}"
+        )
+    print(f"heap reduction: {results['dict list'][0] / results['ImageStore'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+对比元数据缓存每次新建 SQLite 连接与每线程长连接的查询速度
+
+用法：
+    python benchmarks/bench_metadata_cache.py [--rows 100000] [--lookups 20000] [--batch 900]
+
+在临时目录建立含 --rows 行（每个文件夹 500 张）的元数据缓存，分别测量
+单条查询（预览时逐张读取）、随机批量查询和整文件夹查询（扫描时）每秒
+能查多少个路径。
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PicSee import MetadataCache  # noqa: E402
+
+
+def fresh_connection_lookup(db_path, paths):
+    """旧行为：每次调用都 sqlite3.connect 一次，查完即关闭
+
+    不经过 MetadataCache，避免把共享缓存的写队列和 _touch 提交算进基线。
+    """
+    results = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        for path in paths:
+            dir_path, name = os.path.split(path)
+            row = conn.execute(
+                "SELECT f.width, f.height, f.size, f.mtime FROM file_metadata f "
+                "JOIN directories d ON d.dir_id = f.dir_id "
+                "WHERE d.dir_path = ? AND f.name = ?",
+                (dir_path, name),
+            ).fetchone()
+            if row is not None:
+                results[path] = row
+    finally:
+        conn.close()
+    return results
+
+
+def make_cache(db_path, rows):
+    cache = MetadataCache(db_path)
+    items = [
+        {
+            "path": os.path.join("D:\\photos", f"album_{i // 500:04d}", f"IMG_{i:06d}.jpg"),
+            "w": 6000,
+            "h": 4000,
+            "size": 8_000_000 + i,
+            "mtime": 1_700_000_000.0 + i,
+            "embedded": (1024, 9000, 160, 120, 1) if i % 2 else None,
+        }
+        for i in range(rows)
+    ]
+    for i in range(0, rows, 10000):
+        cache.save_metadata_batch(items[i : i + 10000])
+    cache.flush()
+    return cache, [item["path"] for item in items]
+
+
+def rate(func, batches):
+    start = time.perf_counter()
+    found = 0
+    for batch in batches:
+        found += len(func(batch))
+    elapsed = time.perf_counter() - start
+    return sum(len(b) for b in batches) / elapsed, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=900)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "metadata_cache.db")
+        cache, paths = make_cache(db_path, args.rows)
+
+        rng = random.Random(0)
+        sample = [rng.choice(paths) for _ in range(args.lookups)]
+        singles = [[p] for p in sample]
+        batches = [sample[i : i + args.batch] for i in range(0, len(sample), args.batch)]
+        folders = [paths[i : i + 500] for i in range(0, min(len(paths), args.lookups), 500)]
+
+        print(f"rows: {args.rows}, lookups: {args.lookups}")
+        print(f"{'mode':10} {'fresh conn/s':>14} {'persistent/s':>14} {'speedup':>8}")
+        for name, work in (("single", singles), ("batch", batches), ("folder", folders)):
+            before, found_before = rate(lambda b: fresh_connection_lookup(db_path, b), work)
+            after, found_after = rate(cache.get_metadata_batch, work)
+            assert found_before == found_after
+            print(f"{name:10} {before:14.0f} {after:14.0f} {after / before:8.2f}")
+
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+对比向瀑布流页面推送完整图片记录与只推送宽高比（记录按页拉取）的消息大小和构建耗时
+
+用法：
+    python benchmarks/bench_web_messages.py [--count 200000] [--page 200]
+
+模拟一次递归扫描的结果，分别构建旧协议（每张图片一条 path/src/w/h/id 记录）
+和新协议（宽高比列表 + 首屏一页记录）的消息，按 JSON 序列化后的字节数比较。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PicSee import ImageStore  # noqa: E402
+
+
+def build_store(count):
+    store = ImageStore()
+    root = os.path.join(os.sep, "photos", "library")
+    for i in range(count):
+        folder = os.path.join(root, f"{2000 + i // 100000}", f"album_{i // 500:05d}")
+        store.append(
+            os.path.join(folder, f"IMG_{i:07d}.JPG"),
+            6000 - i % 7,
+            4000 + i % 5,
+            5_000_000 + i,
+            1_600_000_000.0 + i * 1.5,
+            None,
+        )
+    return store.view()
+
+
+def record(item, image_id):
+    path = item["path"].replace("\\", "/")
+    return {
+        "path": path,
+        "src": f"{path}?v={int(item['size']):x}-{int(item['mtime'] * 1000):x}",
+        "w": item["w"],
+        "h": item["h"],
+        "id": image_id,
+    }
+
+
+def full_records(view):
+    return json.dumps([record(item, i + 1) for i, item in enumerate(view)])
+
+
+def paged(view, page):
+    ratios = json.dumps(view.aspect_ratios())
+    first_page = json.dumps([record(item, i + 1) for i, item in enumerate(view[:page])])
+    return ratios, first_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=200)
+    args = parser.parse_args()
+
+    view = build_store(args.count)
+
+    start = time.perf_counter()
+    full = full_records(view)
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ratios, first_page = paged(view, args.page)
+    paged_time = time.perf_counter() - start
+
+    mb = 1024 * 1024
+    print(f"images: {args.count}, page: {args.page}")
+    print(f"{'protocol':16} {'message(MB)':>12} {'B/image':>8} {'build(s)':>9}")
+    print(f"{'full records':16} {len(full) / mb:12.2f} {len(full) / args.count:8.1f} {full_time:9.2f}")
+    paged_size = len(ratios) + len(first_page)
+    print(f"{'ratios + page':16} {paged_size / mb:12.2f} {paged_size / args.count:8.1f} {paged_time:9.2f}")
+    print(f"first page: {len(first_page) / 1024:.1f} KB, reduction: {len(full) / paged_size:.1f}x")
+
+
+if __name__ == "__main__":
+    main()